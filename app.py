@@ -1,41 +1,143 @@
 """
 Flask Web Application for AI Image Bias Tagger
+
+create_app() builds the application; run it with a WSGI server in production
+(see wsgi.py and gunicorn.conf.py). The schema and seed data are set up once
+per deploy by `python maintenance.py migrate --seed`, not when a worker boots.
 """
-from flask import Flask, render_template, request, jsonify, session, send_from_directory
+from flask import Flask, Blueprint, current_app, render_template, request, jsonify, session, abort
 from flask_cors import CORS
+from werkzeug.local import LocalProxy
+from werkzeug.security import safe_join
 import os
+import atexit
 import secrets
+import time
+from asset_cache import AssetCache
 from database import Database
+import metrics
+from maintenance import seed_database
 from scraper import get_mock_data
-import json
+import thumbnails
+
+bp = Blueprint('tagger', __name__)
+
+# The current app's Database and AssetCache, so views don't need to look them up
+db = LocalProxy(lambda: current_app.extensions['db'])
+assets = LocalProxy(lambda: current_app.extensions['assets'])
+
 
-app = Flask(__name__)
-app.secret_key = os.environ.get('FLASK_SECRET_KEY', secrets.token_hex(32))
-CORS(app)
+def load_secret_key(path=os.path.join('data', 'secret_key')):
+    """
+    FLASK_SECRET_KEY, or else a key generated once and kept on disk, so that
+    separate worker processes (e.g. uvicorn --workers) sign sessions alike.
+    """
+    key = os.environ.get('FLASK_SECRET_KEY')
+    if key:
+        return key
+    
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process created it; wait until its key has been written
+        for _ in range(50):
+            with open(path) as f:
+                key = f.read().strip()
+            if key:
+                return key
+            time.sleep(0.1)
+        raise RuntimeError(f"Secret key file {path} is empty")
+    
+    key = secrets.token_hex(32)
+    with os.fdopen(fd, 'w') as f:
+        f.write(key)
+    return key
+
+
+def create_app(database=None, initialize=False):
+    """
+    Build the Flask app.
+    
+    The database is opened lazily, so with a preloading server (gunicorn
+    --preload) no SQLite connection exists before workers fork. Pass
+    initialize=True to create missing tables here instead of in a migration.
+    """
+    app = Flask(__name__, static_folder=None)
+    app.secret_key = load_secret_key()
+    CORS(app)
+    
+    # Content-hash ETags and fingerprinted URLs for static files and images
+    app.extensions['assets'] = AssetCache(
+        {
+            'tagger.static': os.path.join(app.root_path, 'static'),
+            'tagger.serve_image': os.path.join(app.root_path, 'images'),
+            'tagger.serve_interface_image': os.path.join(app.root_path, 'interface_images'),
+        },
+        # Generated images never change under the same name
+        max_age={'tagger.serve_image': 24 * 3600, 'tagger.serve_interface_image': 24 * 3600},
+    )
+    app.jinja_env.globals['asset_url'] = app.extensions['assets'].url
+    
+    if database is None:
+        database = Database(initialize=initialize)
+        atexit.register(database.close)
+    app.extensions['db'] = database
+    
+    metrics.init_app(app)
+    app.register_blueprint(bp)
+    return app
 
-# Initialize database
-db = Database()
 
+def start_background_tasks(app):
+    """Start per-process maintenance and the view writer; call once in each worker after it forks"""
+    app.extensions['db'].start_maintenance()
+    app.extensions['db'].start_view_writer()
 
-@app.route('/images/<path:filename>')
+
+@bp.route('/static/<path:filename>', endpoint='static')
+def serve_static(filename):
+    """Serve CSS/JS with content-hash ETags (immutable when fingerprinted)"""
+    return assets.send('tagger.static', filename)
+
+
+@bp.route('/images/<path:filename>')
 def serve_image(filename):
-    """Serve images from the images directory"""
-    return send_from_directory('images', filename)
+    """Serve images from the images directory (resized when ?w= is given)"""
+    width = request.args.get('w', type=int)
+    if width and filename.lower().endswith(thumbnails.IMAGE_EXTENSIONS):
+        source = safe_join(assets.directories['tagger.serve_image'], filename)
+        if source is None or not os.path.isfile(source):
+            abort(404)
+        
+        # Only clients that name WebP get it; image/* and */* also match
+        # accept_mimetypes['image/webp'], including browsers that can't decode it
+        webp = any(value == 'image/webp' and quality > 0 for value, quality in request.accept_mimetypes)
+        fmt = 'webp' if webp else 'jpeg'
+        path, mimetype = thumbnails.get_variant(source, width, fmt)
+        if mimetype:
+            # Variant files are named <source hash>_<width>.<ext>
+            etag = os.path.splitext(os.path.basename(path))[0] + '-' + fmt
+            response = assets.send_derived('tagger.serve_image', os.path.abspath(path), mimetype, etag)
+            response.vary.add('Accept')
+            return response
+    
+    return assets.send('tagger.serve_image', filename)
 
 
-@app.route('/interface_images/<path:filename>')
+@bp.route('/interface_images/<path:filename>')
 def serve_interface_image(filename):
     """Serve interface images from the interface_images directory"""
-    return send_from_directory('interface_images', filename)
+    return assets.send('tagger.serve_interface_image', filename)
 
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Main page"""
     return render_template('index.html')
 
 
-@app.route('/tag')
+@bp.route('/tag')
 def tag_page():
     """Image tagging page"""
     # Create or get user session
@@ -46,7 +148,7 @@ def tag_page():
     return render_template('tag.html')
 
 
-@app.route('/api/next-image')
+@bp.route('/api/next-image')
 def get_next_image():
     """API endpoint to get the next image for tagging"""
     if 'user_id' not in session:
@@ -62,20 +164,64 @@ def get_next_image():
     # Record the view
     db.record_view(image['id'], user_id)
     
-    # Parse tags if they're stored as JSON
-    if image['tags']:
-        try:
-            image['tags'] = json.loads(image['tags'])
-        except (json.JSONDecodeError, TypeError):
-            image['tags'] = []
+    # The image JSON was serialized at import; just wrap it
+    return current_app.response_class(
+        '{"image":' + db.image_payload(image) + ',"has_more":true}',
+        mimetype='application/json'
+    )
+
+
+# Prefetched images stay reserved on the client until it shows them
+MAX_PREFETCH = 10
+MAX_EXCLUDE = 50
+
+
+@bp.route('/api/next-images')
+def get_next_images():
+    """
+    API endpoint to fetch a batch of images for the client to preload.
+    
+    Views are not recorded here but when the client acts on an image
+    (submit/skip with "prefetched": true, or /api/view-image), so a batch
+    costs one query. The client passes the ids it still holds in ?exclude=.
+    """
+    if 'user_id' not in session:
+        session['user_id'] = secrets.token_hex(16)
+        db.create_or_get_session(session['user_id'])
+    
+    user_id = session['user_id']
+    n = max(1, min(request.args.get('n', 5, type=int), MAX_PREFETCH))
+    exclude = [i for i in request.args.get('exclude', '').split(',') if i][:MAX_EXCLUDE]
+    
+    images = db.get_random_unviewed_images(user_id, n, exclude=exclude)
     
-    return jsonify({
-        'image': image,
-        'has_more': True
-    })
+    # Splice the pre-serialized image JSON together instead of re-encoding rows
+    payloads = ','.join(db.image_payload(image) for image in images)
+    has_more = 'true' if len(images) == n else 'false'
+    return current_app.response_class(
+        '{"images":[' + payloads + '],"has_more":' + has_more + '}',
+        mimetype='application/json'
+    )
 
 
-@app.route('/api/submit-tags', methods=['POST'])
+@bp.route('/api/view-image', methods=['POST'])
+def view_image():
+    """API endpoint to record the view of a prefetched image the user didn't act on"""
+    data = request.get_json(silent=True) or {}
+    
+    if 'user_id' not in session:
+        return jsonify({'error': 'No session found'}), 403
+    
+    image_id = data.get('image_id')
+    
+    if not image_id:
+        return jsonify({'error': 'Image ID required'}), 400
+    
+    db.record_view(image_id, session['user_id'])
+    return jsonify({'success': True})
+
+
+@bp.route('/api/submit-tags', methods=['POST'])
 def submit_tags():
     """API endpoint to submit bias tags for an image"""
     data = request.json
@@ -92,19 +238,30 @@ def submit_tags():
     
     user_id = session['user_id']
     
-    # Add each bias tag
-    success = True
-    for bias_type in bias_tags:
-        if not db.add_bias_tag(image_id, user_id, bias_type, notes):
-            success = False
+    # Add all bias tags in one transaction
+    results = db.add_bias_tags(image_id, user_id, bias_tags, notes)
+    if data.get('prefetched'):
+        db.record_view(image_id, user_id)
+    invalid = [bias_type for bias_type, status in results.items() if status == 'invalid']
+    failed = [bias_type for bias_type, status in results.items() if status == 'error']
+    
+    if failed:
+        return jsonify({
+            'success': False,
+            'message': f"Error submitting tags: {', '.join(failed)}",
+            'results': results
+        }), 500
+    if invalid:
+        return jsonify({
+            'success': False,
+            'message': f"Invalid bias tags: {', '.join(repr(t) for t in invalid)}",
+            'results': results
+        }), 400
     
-    if success:
-        return jsonify({'success': True, 'message': 'Tags submitted successfully'})
-    else:
-        return jsonify({'success': False, 'message': 'Error submitting some tags'}), 500
+    return jsonify({'success': True, 'message': 'Tags submitted successfully', 'results': results})
 
 
-@app.route('/api/skip-image', methods=['POST'])
+@bp.route('/api/skip-image', methods=['POST'])
 def skip_image():
     """API endpoint to skip an image without tagging"""
     data = request.json
@@ -117,24 +274,43 @@ def skip_image():
     if not image_id:
         return jsonify({'error': 'Image ID required'}), 400
     
-    # View is already recorded when image was fetched
+    # /api/next-image records the view on fetch; prefetched images record it now
+    if data.get('prefetched'):
+        db.record_view(image_id, session['user_id'])
     return jsonify({'success': True, 'message': 'Image skipped'})
 
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     """Statistics dashboard page"""
     return render_template('dashboard.html')
 
 
-@app.route('/api/statistics')
+@bp.route('/api/statistics')
 def get_statistics():
     """API endpoint to get statistics"""
     stats = db.get_statistics()
     return jsonify(stats)
 
 
-@app.route('/api/load-mock-data', methods=['POST'])
+@bp.route('/metrics')
+def get_metrics():
+    """Request and SQL timings in Prometheus text format"""
+    pool = db.get_pool_stats()
+    views = db.view_writer.get_stats()
+    gauges = {
+        ('db_pool_connections', 'Open database connections'): pool['size'],
+        ('db_pool_in_use', 'Database connections checked out'): pool['in_use'],
+        ('db_pool_waits', 'Checkouts that had to wait for a connection'): pool['waits'],
+        ('db_pool_timeouts', 'Checkouts that timed out'): pool['timeouts'],
+        ('view_queue_size', 'Views waiting to be written'): views['queue_size'],
+        ('view_writes', 'Views written by the background writer'): views['written'],
+        ('view_direct_writes', 'Views written on the request because the queue was full'): views['direct_writes'],
+    }
+    return current_app.response_class(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/api/load-mock-data', methods=['POST'])
 def load_mock_data():
     """API endpoint to load mock data for testing"""
     try:
@@ -152,43 +328,23 @@ def load_mock_data():
         }), 500
 
 
-@app.route('/about')
+@bp.route('/about')
 def about():
     """About page explaining the project"""
     return render_template('about.html')
 
 
-@app.route('/learning')
+@bp.route('/learning')
 def learning():
     """Learning modules page"""
     return render_template('learning.html')
 
 
 if __name__ == '__main__':
-    # Load initial data if database is empty
-    stats = db.get_statistics()
-    if stats['total_images'] == 0:
-        print("Database is empty. Attempting to load scraped images...")
-        
-        # Try to load scraped images first
-        try:
-            import os.path
-            if os.path.exists('scraped_images.json'):
-                with open('scraped_images.json', 'r', encoding='utf-8') as f:
-                    scraped_data = json.load(f)
-                    if scraped_data:
-                        print(f"Loading {len(scraped_data)} scraped images...")
-                        db.add_images(scraped_data)
-                        print("✓ Scraped images loaded successfully!")
-                    else:
-                        raise ValueError("Scraped images file is empty")
-            else:
-                raise FileNotFoundError("No scraped images found")
-        except Exception as e:
-            print(f"Could not load scraped images: {e}")
-            print("Loading mock data instead...")
-            mock_images = get_mock_data()
-            db.add_images(mock_images)
+    # Development server: set up the schema and seed data in-process
+    app = create_app(initialize=True)
+    seed_database(app.extensions['db'])
+    start_background_tasks(app)
     
     # Get port from environment variable (for cloud deployment)
     port = int(os.environ.get('PORT', 5000))
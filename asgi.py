@@ -0,0 +1,269 @@
+"""
+ASGI entry point with an async tagging API
+
+The tagging endpoints (/api/next-image, /api/next-images, /api/submit-tags,
+/api/skip-image, /api/statistics) are served by async handlers that await the
+database through AsyncDatabase, so a slow client or a query waiting on a lock
+holds no thread. Everything else (pages, static files, images, /metrics)
+goes to the Flask app on a ThreadPoolWsgi thread pool (WSGI_THREADS threads
+per process), so those requests run concurrently. Both share Flask's signed session cookie, and
+async responses get the same CORS headers as CORS(app) gives Flask's.
+
+    python maintenance.py migrate --seed
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+"""
+import json
+import secrets
+import time
+from urllib.parse import parse_qs
+
+from flask_cors.core import get_cors_headers, get_cors_options
+from werkzeug.datastructures import Headers
+from werkzeug.http import dump_cookie, parse_cookie
+
+from app import MAX_EXCLUDE, MAX_PREFETCH, create_app
+from async_db import AsyncDatabase, DatabaseBusy
+import metrics
+from threaded_wsgi import ThreadPoolWsgi
+
+flask_app = create_app()
+adb = AsyncDatabase(flask_app.extensions['db'])
+wsgi_app = ThreadPoolWsgi(flask_app)
+
+# Same cookie Flask reads and writes, so a session started on either side works on both
+session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+SESSION_COOKIE = flask_app.config['SESSION_COOKIE_NAME']
+SESSION_MAX_AGE = int(flask_app.permanent_session_lifetime.total_seconds())
+
+# The options CORS(app) resolved from the app config; preflight requests
+# (OPTIONS) aren't async routes, so Flask-CORS still answers those itself
+CORS_OPTIONS = get_cors_options(flask_app)
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.method = scope['method']
+        self.query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        self.body = body
+        self.session_modified = False
+        
+        headers = dict(scope.get('headers') or [])
+        cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+        self.session = {}
+        if session_serializer is not None and SESSION_COOKIE in cookies:
+            try:
+                self.session = dict(session_serializer.loads(cookies[SESSION_COOKIE], max_age=SESSION_MAX_AGE))
+            except Exception:
+                # Tampered or expired; start a new session like Flask does
+                self.session = {}
+    
+    def arg(self, name, default=None, type=str):
+        values = self.query.get(name)
+        if not values:
+            return default
+        try:
+            return type(values[0])
+        except ValueError:
+            return default
+    
+    def json(self):
+        try:
+            return json.loads(self.body) if self.body else {}
+        except ValueError:
+            return {}
+
+
+async def ensure_session(request):
+    """Start a tagging session for this client if it has none"""
+    if 'user_id' not in request.session:
+        request.session['user_id'] = secrets.token_hex(16)
+        request.session_modified = True
+        await adb.create_or_get_session(request.session['user_id'])
+    return request.session['user_id']
+
+
+async def next_image(request):
+    user_id = await ensure_session(request)
+    image = await adb.get_random_unviewed_image(user_id)
+    
+    if not image:
+        return 404, {'error': 'No more images available', 'has_more': False}
+    
+    # Record the view
+    await adb.record_view(image['id'], user_id)
+    
+    # The image JSON was serialized at import; just wrap it
+    return 200, '{"image":' + adb.db.image_payload(image) + ',"has_more":true}'
+
+
+async def next_images(request):
+    user_id = await ensure_session(request)
+    n = max(1, min(request.arg('n', 5, int), MAX_PREFETCH))
+    exclude = [i for i in request.arg('exclude', '').split(',') if i][:MAX_EXCLUDE]
+    
+    images = await adb.get_random_unviewed_images(user_id, n, exclude=exclude)
+    
+    payloads = ','.join(adb.db.image_payload(image) for image in images)
+    has_more = 'true' if len(images) == n else 'false'
+    return 200, '{"images":[' + payloads + '],"has_more":' + has_more + '}'
+
+
+async def submit_tags(request):
+    data = request.json()
+    
+    if 'user_id' not in request.session:
+        return 403, {'error': 'No session found'}
+    
+    image_id = data.get('image_id')
+    bias_tags = data.get('bias_tags', [])
+    notes = data.get('notes', '')
+    
+    if not image_id:
+        return 400, {'error': 'Image ID required'}
+    
+    user_id = request.session['user_id']
+    
+    # Add all bias tags in one transaction
+    results = await adb.add_bias_tags(image_id, user_id, bias_tags, notes)
+    if data.get('prefetched'):
+        await adb.record_view(image_id, user_id)
+    invalid = [bias_type for bias_type, status in results.items() if status == 'invalid']
+    failed = [bias_type for bias_type, status in results.items() if status == 'error']
+    
+    if failed:
+        return 500, {
+            'success': False,
+            'message': f"Error submitting tags: {', '.join(failed)}",
+            'results': results
+        }
+    if invalid:
+        return 400, {
+            'success': False,
+            'message': f"Invalid bias tags: {', '.join(repr(t) for t in invalid)}",
+            'results': results
+        }
+    
+    return 200, {'success': True, 'message': 'Tags submitted successfully', 'results': results}
+
+
+async def skip_image(request):
+    data = request.json()
+    
+    if 'user_id' not in request.session:
+        return 403, {'error': 'No session found'}
+    
+    image_id = data.get('image_id')
+    
+    if not image_id:
+        return 400, {'error': 'Image ID required'}
+    
+    if data.get('prefetched'):
+        await adb.record_view(image_id, request.session['user_id'])
+    return 200, {'success': True, 'message': 'Image skipped'}
+
+
+async def statistics(request):
+    return 200, await adb.get_statistics()
+
+
+ROUTES = {
+    ('GET', '/api/next-image'): next_image,
+    ('GET', '/api/next-images'): next_images,
+    ('POST', '/api/submit-tags'): submit_tags,
+    ('POST', '/api/skip-image'): skip_image,
+    ('GET', '/api/statistics'): statistics,
+}
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def send_response(send, status, body, headers=()):
+    if not isinstance(body, str):
+        body = json.dumps(body)
+    payload = body.encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+        ] + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+def cors_headers(scope):
+    """Access-Control-* (and Vary) headers Flask-CORS would add for this request"""
+    request_headers = Headers([(name.decode('latin-1'), value.decode('latin-1'))
+                               for name, value in scope.get('headers') or []])
+    headers = get_cors_headers(CORS_OPTIONS, request_headers, scope['method'])
+    return [(name.lower().encode('latin-1'), value.encode('latin-1'))
+            for name, value in headers.items(multi=True)]
+
+
+def session_cookie_header(request):
+    """Set-Cookie header carrying the (changed) session, signed the way Flask signs it"""
+    config = flask_app.config
+    cookie = dump_cookie(
+        SESSION_COOKIE,
+        session_serializer.dumps(request.session),
+        path=config['SESSION_COOKIE_PATH'] or config['APPLICATION_ROOT'] or '/',
+        domain=config['SESSION_COOKIE_DOMAIN'] or None,
+        secure=config['SESSION_COOKIE_SECURE'],
+        httponly=config['SESSION_COOKIE_HTTPONLY'],
+        samesite=config['SESSION_COOKIE_SAMESITE'],
+    )
+    return (b'set-cookie', cookie.encode('latin-1'))
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Each server process runs its own maintenance and view writer threads
+            flask_app.extensions['db'].start_maintenance()
+            flask_app.extensions['db'].start_view_writer()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            adb.close()
+            wsgi_app.close()
+            flask_app.extensions['db'].stop_view_writer()
+            flask_app.extensions['db'].stop_maintenance()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    
+    handler = None
+    if scope['type'] == 'http':
+        handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is None:
+        return await wsgi_app(scope, receive, send)
+    
+    start = time.perf_counter()
+    request = Request(scope, await read_body(receive))
+    headers = cors_headers(scope)
+    try:
+        status, body = await handler(request)
+        if request.session_modified:
+            headers.append(session_cookie_header(request))
+    except DatabaseBusy:
+        status, body = 503, {'error': 'Server busy, please retry'}
+        headers.append((b'retry-after', b'1'))
+    except Exception as e:
+        print(f"Error handling {scope['path']}: {e}")
+        status, body = 500, {'error': 'Internal server error'}
+    
+    await send_response(send, status, body, headers)
+    metrics.observe_request(scope['path'], scope['method'], status, time.perf_counter() - start)
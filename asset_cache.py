@@ -0,0 +1,99 @@
+"""
+HTTP caching for static files and images
+
+Every file is served with an ETag derived from its content hash (computed
+once per file version and memoized), so repeat requests revalidate with a
+304 instead of re-downloading. URLs built with asset_url() carry the hash as
+a ?v= fingerprint; a request whose fingerprint matches the current file is
+marked immutable and cached by browsers and CDNs for a year.
+"""
+import hashlib
+import os
+import threading
+
+from flask import request, send_from_directory, send_file, url_for, abort
+from werkzeug.security import safe_join
+
+ONE_YEAR = 365 * 24 * 3600
+
+_hash_cache = {}
+_hash_lock = threading.Lock()
+
+
+def file_hash(path):
+    """SHA-256 prefix of a file's bytes, memoized on (path, mtime, size)"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    
+    with _hash_lock:
+        digest = _hash_cache.get(key)
+    if digest:
+        return digest
+    
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()[:16]
+    
+    with _hash_lock:
+        _hash_cache[key] = digest
+    return digest
+
+
+class AssetCache:
+    """
+    Maps route endpoints to the directories they serve and applies the
+    caching policy when sending files from them.
+    
+    `max_age` is how long an un-fingerprinted URL may be used without
+    revalidating; 0 means "always revalidate" (cheap, thanks to the ETag).
+    """
+    def __init__(self, directories, max_age=None):
+        self.directories = directories
+        self.max_age = max_age or {}
+    
+    def _path(self, endpoint, filename):
+        path = safe_join(self.directories[endpoint], filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+    
+    def url(self, endpoint, filename):
+        """url_for() with a content-hash fingerprint, for use in templates"""
+        path = self._path(endpoint, filename)
+        if path is None:
+            return url_for(endpoint, filename=filename)
+        return url_for(endpoint, filename=filename, v=file_hash(path))
+    
+    def _apply_policy(self, response, endpoint, etag):
+        cache_control = response.cache_control
+        cache_control.public = True
+        # send_file() defaults to no-cache; start from a clean slate
+        cache_control.no_cache = None
+        
+        if request.args.get('v') == etag:
+            cache_control.max_age = ONE_YEAR
+            cache_control.immutable = True
+        else:
+            cache_control.max_age = self.max_age.get(endpoint, 0)
+            if not cache_control.max_age:
+                cache_control.no_cache = True
+        return response
+    
+    def send(self, endpoint, filename):
+        """Send a file with a content-hash ETag, answering 304 when it matches"""
+        path = self._path(endpoint, filename)
+        if path is None:
+            abort(404)
+        
+        etag = file_hash(path)
+        response = send_from_directory(
+            self.directories[endpoint], filename, etag=etag, conditional=True
+        )
+        return self._apply_policy(response, endpoint, etag)
+    
+    def send_derived(self, endpoint, path, mimetype, etag):
+        """Send a generated file (e.g. a resized variant) under a caller-supplied ETag"""
+        response = send_file(path, mimetype=mimetype, etag=etag, conditional=True)
+        return self._apply_policy(response, endpoint, etag)
@@ -0,0 +1,67 @@
+"""
+Async access to the Database for the ASGI tagging API
+
+Database calls run on a small dedicated thread pool sized to the connection
+pool, so awaiting a query never ties up more than a handful of threads however
+many requests are in flight. The number of calls waiting for that pool is
+bounded: past the limit, calls fail fast with DatabaseBusy (served as a 503)
+instead of queueing without end and dragging every request's latency up.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DatabaseBusy(Exception):
+    """Too many database calls are already queued; shed this request"""
+
+
+class AsyncDatabase:
+    """
+    Awaitable wrapper around a Database.
+    
+    Any Database method can be awaited through it, e.g.
+    `await adb.get_statistics()`; it runs on the executor.
+    """
+    def __init__(self, db, workers=None, max_pending=None):
+        self.db = db
+        self.workers = workers or db.pool.max_size
+        if max_pending is None:
+            max_pending = int(os.environ.get('DB_EXECUTOR_QUEUE', self.workers * 64))
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='db')
+        
+        # Only touched from the event loop thread, so no lock is needed
+        self._pending = 0
+        self.stats = {'calls': 0, 'rejected': 0, 'peak_pending': 0}
+    
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking call on the DB executor, or raise DatabaseBusy if it's saturated"""
+        if self._pending >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise DatabaseBusy(f"{self._pending} database calls already pending")
+        
+        self._pending += 1
+        self.stats['calls'] += 1
+        self.stats['peak_pending'] = max(self.stats['peak_pending'], self._pending)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self._pending -= 1
+    
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+        
+        async def call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        return call
+    
+    def get_stats(self):
+        return dict(self.stats, pending=self._pending, max_pending=self.max_pending, workers=self.workers)
+    
+    def close(self):
+        self._executor.shutdown(wait=True)
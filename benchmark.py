@@ -0,0 +1,485 @@
+"""
+Benchmarks for the Database layer and the tagging API
+
+Generates a synthetic database at a given scale (images, image_views and
+bias_tags each get that many rows), times each Database method on the hot
+paths, and drives the tagging API with many concurrent sessions through the
+Flask test client or against a running server. Results are written as JSON
+with p50/p95/p99 latencies and throughput per operation, so runs can be
+compared before a deploy.
+
+Benchmarks run on a copy of the generated database, so every run starts from
+the same data.
+
+Usage:
+    python benchmark.py generate --rows 100k         # data/benchmark-100k.db
+    python benchmark.py micro --rows 100k --output micro-100k.json
+    python benchmark.py load --rows 100k --sessions 32 --requests 50
+    python benchmark.py load --url http://localhost:5000 --sessions 32
+    python benchmark.py load --client single     # legacy one-image-per-request flow
+    python benchmark.py all --rows 10k 100k 1m --output results.json
+
+Results go to data/benchmark-results.json unless --output says otherwise.
+"""
+import argparse
+import contextlib
+import http.cookiejar
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from database import Database
+
+BIAS_TYPES = ['age', 'race', 'gender', 'class']
+# Prefetch queue of static/js/tagger.js: batch size, and the queue length that triggers a refill
+PREFETCH_SIZE = 5
+PREFETCH_LOW_WATER = 2
+PROMPT_WORDS = ['portrait', 'woman', 'man', 'child', 'family', 'crowd', 'elderly', 'teenager',
+                'street', 'office', 'kitchen', 'beach', 'smiling', 'walking', 'cinematic', 'photo']
+
+
+def parse_rows(text):
+    """'10k' -> 10000, '1m' -> 1000000"""
+    text = str(text).lower().replace('_', '').replace(',', '')
+    multiplier = 1
+    if text[-1:] in ('k', 'm'):
+        multiplier = 1000 if text[-1] == 'k' else 1000000
+        text = text[:-1]
+    return int(float(text) * multiplier)
+
+
+def format_rows(rows):
+    if rows % 1000000 == 0:
+        return f'{rows // 1000000}m'
+    if rows % 1000 == 0:
+        return f'{rows // 1000}k'
+    return str(rows)
+
+
+def default_db_path(rows):
+    return os.path.join('data', f'benchmark-{format_rows(rows)}.db')
+
+
+def generate(path, rows, sessions=None, seed=42, chunk_size=50000):
+    """
+    Build a benchmark database with `rows` images, image views and bias tags.
+    
+    Views and tags are spread over `sessions` taggers (default rows / 20),
+    counters are rebuilt from the raw rows, and the 5-viewer lifecycle rule
+    is applied, so the data looks like a database that has been in use.
+    """
+    rng = random.Random(seed)
+    sessions = sessions or max(100, rows // 20)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    
+    start = time.perf_counter()
+    db = Database(path)
+    try:
+        def images():
+            for n in range(rows):
+                words = rng.sample(PROMPT_WORDS, 5)
+                yield {
+                    'id': f'bench_{n}',
+                    'url': f'https://example.com/images/bench_{n}.jpg',
+                    'prompt': 'A ' + ' '.join(words),
+                    'tags': words[:3],
+                    'source': 'benchmark',
+                }
+        db.import_images(images(), chunk_size=chunk_size)
+        
+        session_ids = [f'bench_session_{n}' for n in range(sessions)]
+        
+        def unique_pairs(count, make):
+            seen = set()
+            while len(seen) < count:
+                pair = make()
+                if pair not in seen:
+                    seen.add(pair)
+                    yield pair
+        
+        views = unique_pairs(rows, lambda: (f'bench_{rng.randrange(rows)}', rng.choice(session_ids)))
+        tags = unique_pairs(rows, lambda: (f'bench_{rng.randrange(rows)}', rng.choice(session_ids),
+                                           rng.choice(BIAS_TYPES)))
+        
+        conn = db.get_connection()
+        try:
+            conn.executemany('INSERT INTO user_sessions (session_id) VALUES (?)',
+                             [(s,) for s in session_ids])
+            _insert_chunks(conn, 'INSERT INTO image_views (image_id, user_session) VALUES (?, ?)',
+                           views, chunk_size)
+            _insert_chunks(conn, 'INSERT INTO bias_tags (image_id, user_session, bias_type) VALUES (?, ?, ?)',
+                           tags, chunk_size)
+            conn.commit()
+        finally:
+            conn.close()
+        
+        db.reconcile_counters()
+        conn = db.get_connection()
+        try:
+            conn.execute('UPDATE images SET view_count = unique_viewers')
+            conn.execute('''
+                UPDATE images
+                SET status = 'deleted', deleted_at = CURRENT_TIMESTAMP
+                WHERE unique_viewers >= 5 AND bias_tag_count = 0
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+        db.optimize()
+        db.checkpoint('TRUNCATE')
+    finally:
+        db.close()
+    
+    seconds = time.perf_counter() - start
+    print(f"✓ Generated {path}: {rows:,} images / views / tags, {sessions:,} sessions in {seconds:.1f}s")
+    return {'path': path, 'rows': rows, 'sessions': sessions, 'seconds': seconds}
+
+
+def _insert_chunks(conn, sql, pairs, chunk_size):
+    chunk = []
+    for pair in pairs:
+        chunk.append(pair)
+        if len(chunk) >= chunk_size:
+            conn.executemany(sql, chunk)
+            chunk = []
+    if chunk:
+        conn.executemany(sql, chunk)
+
+
+@contextlib.contextmanager
+def working_copy(path):
+    """
+    Copy of a benchmark database in a temp dir, so runs don't change the
+    original; the directory is removed when the block exits
+    """
+    if not os.path.exists(path):
+        raise SystemExit(f"{path} not found; run `python benchmark.py generate` first")
+    directory = tempfile.mkdtemp(prefix='benchmark-')
+    try:
+        copy = os.path.join(directory, os.path.basename(path))
+        source = sqlite3.connect(path)
+        target = sqlite3.connect(copy)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        yield copy
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, seconds=None):
+    """p50/p95/p99 (ms) and throughput for a list of latencies in seconds"""
+    values = sorted(latencies)
+    total = seconds if seconds is not None else sum(values)
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else None,
+        'p50_ms': round(percentile(values, 50) * 1000, 3) if values else None,
+        'p95_ms': round(percentile(values, 95) * 1000, 3) if values else None,
+        'p99_ms': round(percentile(values, 99) * 1000, 3) if values else None,
+        'max_ms': round(values[-1] * 1000, 3) if values else None,
+        'throughput_per_s': round(len(values) / total, 1) if total else None,
+    }
+
+
+def time_calls(func, iterations, warmup=3):
+    """Call func(n) for n in range(iterations) and return per-call latencies"""
+    for n in range(warmup):
+        func(-1 - n)
+    latencies = []
+    for n in range(iterations):
+        start = time.perf_counter()
+        func(n)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def print_table(title, results):
+    print(f"\n{title}")
+    print(f"  {'operation':<34} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>10}")
+    for name, r in results.items():
+        if not r['count']:
+            continue
+        print(f"  {name:<34} {r['count']:>7} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['throughput_per_s']:>10,.1f}")
+
+
+def micro(path, iterations=200, seed=7):
+    """Time the Database methods behind the tagging API on a copy of `path`"""
+    rng = random.Random(seed)
+    with working_copy(path) as copy:
+        db = Database(copy)
+        try:
+            conn = db.get_connection()
+            try:
+                image_ids = [row[0] for row in conn.execute(
+                    "SELECT id FROM images WHERE status = 'active' ORDER BY random() LIMIT 5000")]
+                sessions = [row[0] for row in conn.execute(
+                    'SELECT session_id FROM user_sessions ORDER BY random() LIMIT 1000')]
+            finally:
+                conn.close()
+            if not image_ids or not sessions:
+                raise SystemExit(f"{path} has no active images or sessions to benchmark")
+            
+            def fresh_session(n):
+                return f'micro_{n}'
+            
+            benchmarks = [
+                ('create_or_get_session', lambda n: db.create_or_get_session(fresh_session(n)), iterations),
+                ('get_random_unviewed_image', lambda n: db.get_random_unviewed_image(rng.choice(sessions)), iterations),
+                ('get_random_unviewed_images(5)',
+                 lambda n: db.get_random_unviewed_images(rng.choice(sessions), 5), iterations),
+                ('record_view', lambda n: db.record_view(rng.choice(image_ids), fresh_session(n)), iterations),
+                ('record_views(200)',
+                 lambda n: db.record_views([(rng.choice(image_ids), f'micro_batch_{n}_{k}') for k in range(200)]),
+                 max(5, iterations // 20)),
+                ('add_bias_tags',
+                 lambda n: db.add_bias_tags(rng.choice(image_ids), fresh_session(n), rng.sample(BIAS_TYPES, 2)),
+                 iterations),
+                ('get_image_details', lambda n: db.get_image_details(rng.choice(image_ids)), iterations),
+                ('get_images_by_tag', lambda n: db.get_images_by_tag(rng.choice(PROMPT_WORDS)), iterations),
+                ('get_statistics (cached)', lambda n: db.get_statistics(), iterations),
+                ('get_statistics (fresh)', lambda n: db.get_statistics(fresh=True), max(5, iterations // 10)),
+                ('get_tag_counts', lambda n: db.get_tag_counts(), max(5, iterations // 10)),
+                ('reconcile_counters', lambda n: db.reconcile_counters(), 3),
+            ]
+            
+            results = {}
+            for name, func, count in benchmarks:
+                results[name] = summarize(time_calls(func, count, warmup=1 if count <= 5 else 3))
+            return results
+        finally:
+            db.close()
+
+
+class TestClientSession:
+    """One tagger talking to the app in-process through the Flask test client"""
+    def __init__(self, app):
+        self.client = app.test_client()
+    
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get_json(silent=True)
+    
+    def post(self, path, data):
+        response = self.client.post(path, json=data)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HTTPSession:
+    """One tagger talking to a running server, with its own cookie jar"""
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    
+    def _send(self, request):
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as e:
+            return e.code, None
+    
+    def get(self, path):
+        return self._send(urllib.request.Request(self.base_url + path))
+    
+    def post(self, path, data):
+        return self._send(urllib.request.Request(
+            self.base_url + path, data=json.dumps(data).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST'))
+
+
+def load(make_session, sessions=16, requests_per_session=50, tag_ratio=0.6, stats_every=10, seed=11,
+         client='prefetch'):
+    """
+    Drive the tagging flow from `sessions` concurrent clients.
+    
+    With client='prefetch' each one behaves like tagger.js: it keeps a queue
+    filled from GET /api/next-images (excluding the ids it holds), refilling
+    when it runs low, and submits or skips with "prefetched": true.
+    client='single' uses GET /api/next-image once per image instead. Either
+    way it submits tags tag_ratio of the time (skipping otherwise), plus
+    GET /api/statistics every `stats_every` images.
+    """
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+    
+    def timed(results, name, call):
+        start = time.perf_counter()
+        status, body = call()
+        results.setdefault(name, []).append(time.perf_counter() - start)
+        # Running out of images is a 404 from next-image, not a failure
+        if status >= 400 and not (name == '/api/next-image' and status == 404):
+            results.setdefault(('errors', name), []).append(status)
+        return status, body
+    
+    def act(results, rng, session, n, image_id, prefetched):
+        """Tag or skip the image on screen, and poll the dashboard now and then"""
+        if rng.random() < tag_ratio:
+            tags = rng.sample(BIAS_TYPES, rng.randint(1, 2))
+            timed(results, '/api/submit-tags', lambda: session.post(
+                '/api/submit-tags', {'image_id': image_id, 'bias_tags': tags, 'prefetched': prefetched}))
+        else:
+            timed(results, '/api/skip-image', lambda: session.post(
+                '/api/skip-image', {'image_id': image_id, 'prefetched': prefetched}))
+        if stats_every and n % stats_every == 0:
+            timed(results, '/api/statistics', lambda: session.get('/api/statistics'))
+    
+    def single_tagger(results, rng, session):
+        for n in range(requests_per_session):
+            status, body = timed(results, '/api/next-image', lambda: session.get('/api/next-image'))
+            if status != 200 or not body:
+                return
+            act(results, rng, session, n, body['image']['id'], False)
+    
+    def prefetch_tagger(results, rng, session):
+        queue = []
+        has_more = True
+        
+        def fetch(held):
+            path = f'/api/next-images?n={PREFETCH_SIZE}&exclude=' + urllib.parse.quote(','.join(held))
+            status, body = timed(results, '/api/next-images', lambda: session.get(path))
+            if status != 200 or not body:
+                return False
+            queue.extend(image['id'] for image in body['images'])
+            return body['has_more']
+        
+        for n in range(requests_per_session):
+            if not queue:
+                has_more = fetch([])
+            if not queue:
+                return
+            image_id = queue.pop(0)
+            # tagger.js refills once the image is on screen, holding it and the queue back
+            if has_more and len(queue) <= PREFETCH_LOW_WATER:
+                has_more = fetch(queue + [image_id])
+            act(results, rng, session, n, image_id, True)
+    
+    def tagger(number):
+        rng = random.Random(seed + number)
+        session = make_session()
+        results = {}
+        if client == 'single':
+            single_tagger(results, rng, session)
+        else:
+            prefetch_tagger(results, rng, session)
+        with lock:
+            for name, values in results.items():
+                if isinstance(name, tuple):
+                    errors[name[1]] = errors.get(name[1], 0) + len(values)
+                else:
+                    latencies.setdefault(name, []).extend(values)
+    
+    threads = [threading.Thread(target=tagger, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    
+    results = {name: summarize(values, seconds) for name, values in sorted(latencies.items())}
+    results['total'] = summarize([v for values in latencies.values() for v in values], seconds)
+    for name, count in errors.items():
+        results[name]['errors'] = count
+    return results
+
+
+def load_test_client(path, **kwargs):
+    """Run the load driver in-process against a copy of `path`"""
+    from app import create_app, start_background_tasks
+    
+    with working_copy(path) as copy:
+        db = Database(copy, initialize=False)
+        app = create_app(database=db)
+        start_background_tasks(app)
+        try:
+            return load(lambda: TestClientSession(app), **kwargs)
+        finally:
+            db.close()
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def write_report(report, output):
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+    print(f"\n✓ Results written to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the database layer and tagging API")
+    parser.add_argument('command', choices=['generate', 'micro', 'load', 'all'])
+    parser.add_argument('--rows', nargs='+', default=['10k'],
+                        help="Rows per table, e.g. 10k 100k 1m (default: 10k)")
+    parser.add_argument('--db', help="Benchmark database (default: data/benchmark-<rows>.db)")
+    parser.add_argument('--iterations', type=int, default=200, help="Calls per micro-benchmark (default: 200)")
+    parser.add_argument('--sessions', type=int, default=16, help="Concurrent taggers in the load test (default: 16)")
+    parser.add_argument('--requests', type=int, default=50, help="Images per tagger in the load test (default: 50)")
+    parser.add_argument('--client', choices=['prefetch', 'single'], default='prefetch',
+                        help="Load-test client: tagger.js's prefetch queue, or one /api/next-image "
+                             "per image (default: prefetch)")
+    parser.add_argument('--url', help="Load-test a running server instead of the in-process test client")
+    parser.add_argument('--output', default=os.path.join('data', 'benchmark-results.json'),
+                        help="Where to write the JSON results (default: data/benchmark-results.json)")
+    args = parser.parse_args()
+    
+    report = {'environment': environment(), 'runs': []}
+    for size in args.rows:
+        rows = parse_rows(size)
+        path = args.db or default_db_path(rows)
+        run = {'rows': rows, 'db': path}
+        
+        if args.command == 'generate' or (args.command == 'all' and not os.path.exists(path)):
+            run['generate'] = generate(path, rows)
+        if args.command in ('micro', 'all'):
+            run['micro'] = micro(path, args.iterations)
+            print_table(f"Database methods ({format_rows(rows)} rows)", run['micro'])
+        if args.command in ('load', 'all'):
+            options = {'sessions': args.sessions, 'requests_per_session': args.requests, 'client': args.client}
+            if args.url:
+                run['load'] = load(lambda: HTTPSession(args.url), **options)
+            else:
+                run['load'] = load_test_client(path, **options)
+            run['load_options'] = dict(options, target=args.url or 'test_client')
+            print_table(f"Tagging API, {args.sessions} sessions ({format_rows(rows)} rows)", run['load'])
+        report['runs'].append(run)
+    
+    if args.command != 'generate':
+        write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Persistent crawl frontier for the Sora scraper
+
+Every detail-page URL is tracked in a small SQLite database with its
+progress (queued -> fetched -> parsed -> downloaded, or failed) and the
+scraped record, written as soon as each page completes. A crashed or
+interrupted run can then be resumed without re-scraping finished pages.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+QUEUED = 'queued'
+FETCHED = 'fetched'
+PARSED = 'parsed'
+DOWNLOADED = 'downloaded'
+FAILED = 'failed'
+
+
+class CrawlState:
+    def __init__(self, db_path='data/crawl_state.db', max_attempts=3):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        
+        # Scraper workers share one connection; the lock serializes them
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('PRAGMA synchronous = NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS crawl_frontier (
+                url TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                image_id TEXT,
+                record TEXT,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_crawl_frontier_status ON crawl_frontier(status, seq)')
+        self._conn.commit()
+    
+    def enqueue(self, urls):
+        """Add newly discovered URLs (already known ones keep their state)"""
+        with self._lock:
+            next_seq = self._conn.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM crawl_frontier').fetchone()[0]
+            before = self._conn.total_changes
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO crawl_frontier (url, seq) VALUES (?, ?)',
+                [(url, next_seq + offset) for offset, url in enumerate(urls)]
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+    
+    def mark(self, url, status, record=None, error=None):
+        """
+        Record a URL's progress, committing immediately. Every try that
+        doesn't end in DOWNLOADED is marked FAILED once, which counts it
+        against max_attempts.
+        """
+        with self._lock:
+            self._conn.execute('''
+                UPDATE crawl_frontier
+                SET status = ?,
+                    image_id = COALESCE(?, image_id),
+                    record = COALESCE(?, record),
+                    error = ?,
+                    attempts = attempts + (? = 'failed'),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE url = ?
+            ''', (
+                status,
+                record.get('id') if record else None,
+                json.dumps(record, ensure_ascii=False) if record else None,
+                error,
+                status,
+                url,
+            ))
+            self._conn.commit()
+    
+    def pending_urls(self, limit=None):
+        """URLs still to scrape, in discovery order, skipping ones that keep failing"""
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT url FROM crawl_frontier
+                WHERE status != 'downloaded' AND attempts < ?
+                ORDER BY seq
+                LIMIT ?
+            ''', (self.max_attempts, -1 if limit is None else limit)).fetchall()
+        return [row['url'] for row in rows]
+    
+    def completed_records(self):
+        """Scraped records of finished URLs, in discovery order"""
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT record FROM crawl_frontier
+                WHERE status = 'downloaded' AND record IS NOT NULL
+                ORDER BY seq
+            ''').fetchall()
+        return [json.loads(row['record']) for row in rows]
+    
+    def reset(self):
+        """Forget every URL, for a crawl that starts from scratch"""
+        with self._lock:
+            self._conn.execute('DELETE FROM crawl_frontier')
+            self._conn.commit()
+    
+    def summary(self):
+        """Number of URLs in each status"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT status, COUNT(*) AS count FROM crawl_frontier GROUP BY status'
+            ).fetchall()
+        return {row['status']: row['count'] for row in rows}
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -5,28 +5,476 @@ import sqlite3
 from datetime import datetime
 import json
 import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import image_hash
+import metrics
+import migrations
+from view_writer import ViewWriter
+
+
+class StorageProfile:
+    """
+    SQLite tuning applied to every pooled connection.
+    
+    The defaults favour a read-heavy web workload with a steady trickle of
+    small writes: WAL lets readers keep going while a view or tag is being
+    written, and synchronous=NORMAL is durable across application crashes
+    (only an OS crash can lose the last few commits).
+    """
+    def __init__(self, journal_mode='WAL', synchronous='NORMAL', cache_size_kb=16384,
+                 mmap_size_mb=128, temp_store='MEMORY', busy_timeout_ms=5000,
+                 wal_autocheckpoint=1000, maintenance_interval=300):
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        self.temp_store = temp_store
+        self.busy_timeout_ms = busy_timeout_ms
+        self.wal_autocheckpoint = wal_autocheckpoint
+        self.maintenance_interval = maintenance_interval
+    
+    @classmethod
+    def from_env(cls):
+        """Build a profile from DB_* environment variables"""
+        env = os.environ
+        return cls(
+            journal_mode=env.get('DB_JOURNAL_MODE', 'WAL'),
+            synchronous=env.get('DB_SYNCHRONOUS', 'NORMAL'),
+            cache_size_kb=int(env.get('DB_CACHE_SIZE_KB', 16384)),
+            mmap_size_mb=int(env.get('DB_MMAP_SIZE_MB', 128)),
+            temp_store=env.get('DB_TEMP_STORE', 'MEMORY'),
+            busy_timeout_ms=int(env.get('DB_BUSY_TIMEOUT_MS', 5000)),
+            wal_autocheckpoint=int(env.get('DB_WAL_AUTOCHECKPOINT', 1000)),
+            maintenance_interval=float(env.get('DB_MAINTENANCE_INTERVAL', 300)),
+        )
+    
+    def connection_pragmas(self):
+        """Per-connection PRAGMA statements (these are not persisted in the file)"""
+        return [
+            f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}',
+            f'PRAGMA synchronous = {self.synchronous}',
+            # Negative cache_size is in KiB rather than pages
+            f'PRAGMA cache_size = -{int(self.cache_size_kb)}',
+            f'PRAGMA mmap_size = {int(self.mmap_size_mb) * 1024 * 1024}',
+            f'PRAGMA temp_store = {self.temp_store}',
+            f'PRAGMA wal_autocheckpoint = {int(self.wal_autocheckpoint)}',
+        ]
+    
+    def apply(self, conn):
+        """Apply the per-connection settings to a freshly opened connection"""
+        for pragma in self.connection_pragmas():
+            conn.execute(pragma)
+
+
+class StatisticsCache:
+    """
+    In-process cache for the dashboard statistics.
+    
+    Writes call invalidate(); a dirty cache is recomputed at most once every
+    `min_refresh` seconds however fast writes arrive, and a clean one is still
+    refreshed after `ttl` seconds to pick up writes made by other processes.
+    Only one thread recomputes at a time - the others keep serving the
+    previous snapshot instead of piling onto the database.
+    """
+    def __init__(self, compute, ttl=30.0, min_refresh=1.0):
+        self._compute = compute
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        
+        self._value = None
+        self._computed_at = 0.0
+        self._dirty = False
+        self._refresh_lock = threading.Lock()
+        
+        self.stats = {'hits': 0, 'refreshes': 0}
+    
+    def _is_stale(self):
+        age = time.monotonic() - self._computed_at
+        return (self._value is None
+                or age >= self.ttl
+                or (self._dirty and age >= self.min_refresh))
+    
+    def get(self):
+        """Return the cached statistics, recomputing them if stale"""
+        if not self._is_stale():
+            self.stats['hits'] += 1
+            return self._value
+        
+        # Serve the previous snapshot while another thread refreshes
+        blocking = self._value is None
+        if not self._refresh_lock.acquire(blocking=blocking):
+            self.stats['hits'] += 1
+            return self._value
+        
+        try:
+            if self._is_stale():
+                # Clear the flag first so writes during the recompute re-dirty it
+                self._dirty = False
+                self._value = self._compute()
+                self._computed_at = time.monotonic()
+                self.stats['refreshes'] += 1
+            return self._value
+        finally:
+            self._refresh_lock.release()
+    
+    def invalidate(self):
+        """Mark the cached statistics as out of date"""
+        self._dirty = True
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a sqlite3 connection that hands itself back to the
+    pool on close() instead of closing the underlying connection.
+    """
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self.last_used = time.monotonic()
+        self.checked_out = False
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+        self.close()
+        return False
+    
+    def close(self):
+        """Return the connection to the pool"""
+        self._pool.release(self)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections with per-thread reuse.
+    
+    A thread that releases a connection gets that same connection back on its
+    next checkout (if nobody else has taken it meanwhile), so the page cache
+    and prepared statements stay warm for the thread serving a request.
+    """
+    def __init__(self, db_path, max_size=8, timeout=10.0, health_check_interval=30.0,
+                 profile=None):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.profile = profile
+        
+        self._idle = []
+        self._all = set()
+        self._local = threading.local()
+        self._cond = threading.Condition(threading.Lock())
+        self._closed = False
+        
+        self.stats = {
+            'checkouts': 0,
+            'reused': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+        }
+    
+    def _connect(self):
+        """Open a new underlying sqlite3 connection"""
+        busy_timeout = self.profile.busy_timeout_ms / 1000 if self.profile else 5.0
+        conn = sqlite3.connect(self.db_path, timeout=busy_timeout, check_same_thread=False,
+                               factory=metrics.connection_factory())
+        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        if self.profile:
+            self.profile.apply(conn)
+        return conn
+    
+    def _is_healthy(self, pooled):
+        """Ping connections that have been idle for a while"""
+        if time.monotonic() - pooled.last_used < self.health_check_interval:
+            return True
+        try:
+            pooled._conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def _discard(self, pooled):
+        """Close a connection and forget about it (caller holds the lock)"""
+        self._all.discard(pooled)
+        self.stats['connections_discarded'] += 1
+        try:
+            pooled._conn.close()
+        except sqlite3.Error:
+            pass
+    
+    def acquire(self):
+        """Check out a connection, preferring the one this thread used last"""
+        deadline = time.monotonic() + self.timeout
+        
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+                
+                pooled = None
+                preferred = getattr(self._local, 'conn', None)
+                if preferred is not None and preferred in self._idle:
+                    self._idle.remove(preferred)
+                    pooled = preferred
+                    self.stats['reused'] += 1
+                elif self._idle:
+                    pooled = self._idle.pop()
+                
+                if pooled is not None:
+                    if not self._is_healthy(pooled):
+                        self._discard(pooled)
+                        continue
+                    break
+                
+                if len(self._all) < self.max_size:
+                    pooled = PooledConnection(self, self._connect())
+                    self._all.add(pooled)
+                    self.stats['connections_created'] += 1
+                    break
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available after {self.timeout}s "
+                        f"(pool size {self.max_size})"
+                    )
+                if not waited:
+                    self.stats['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+            
+            pooled.checked_out = True
+            self.stats['checkouts'] += 1
+        
+        self._local.conn = pooled
+        return pooled
+    
+    def release(self, pooled):
+        """Return a connection to the pool, rolling back any open transaction"""
+        with self._cond:
+            if not pooled.checked_out:
+                return  # Double close() is a no-op, like sqlite3
+            pooled.checked_out = False
+            
+            try:
+                if pooled._conn.in_transaction:
+                    pooled._conn.rollback()
+            except sqlite3.Error:
+                self._discard(pooled)
+                self._cond.notify()
+                return
+            
+            if self._closed:
+                self._discard(pooled)
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._cond.notify()
+    
+    def close(self):
+        """Close idle connections now; busy ones are closed when released"""
+        with self._cond:
+            self._closed = True
+            for pooled in self._idle:
+                self._discard(pooled)
+            self._idle = []
+            self._cond.notify_all()
+    
+    def get_stats(self):
+        """Snapshot of pool counters plus current occupancy"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats['size'] = len(self._all)
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = len(self._all) - len(self._idle)
+            stats['max_size'] = self.max_size
+        return stats
 
 
 class Database:
-    def __init__(self, db_path='data/bias_tagger.db'):
+    # Random rowid probes per selection query, and query rounds before the
+    # get_random_unviewed_image() fallback scan kicks in
+    SELECTION_PROBES = 16
+    SELECTION_PROBE_ROUNDS = 2
+    
+    def __init__(self, db_path='data/bias_tagger.db', pool_size=None, profile=None, initialize=True):
         self.db_path = db_path
+        self.profile = profile or StorageProfile.from_env()
         
         # Create data directory if it doesn't exist
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
-        self.init_database()
+        if pool_size is None:
+            pool_size = int(os.environ.get('DB_POOL_SIZE', 8))
+        self.pool = ConnectionPool(
+            db_path,
+            max_size=pool_size,
+            timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            profile=self.profile,
+        )
+        
+        self._maintenance_thread = None
+        self._maintenance_stop = threading.Event()
+        
+        # Idle sessions are expired (and their views archived) by the maintenance thread
+        self.session_ttl_days = float(os.environ.get('SESSION_TTL_DAYS', 30))
+        self.session_cleanup_batch = int(os.environ.get('SESSION_CLEANUP_BATCH', 500))
+        self.vacuum_pages = int(os.environ.get('VACUUM_PAGES', 1000))
+        
+        # Views are written directly until start_view_writer() is called
+        self.view_writer = ViewWriter(self)
+        
+        self.stats_cache = StatisticsCache(
+            self._compute_statistics,
+            ttl=float(os.environ.get('STATS_CACHE_TTL', 30)),
+            min_refresh=float(os.environ.get('STATS_MIN_REFRESH', 1)),
+        )
+        
+        # Web workers skip this; `maintenance.py migrate` sets up the schema once per deploy
+        if initialize:
+            self.init_database()
     
     def get_connection(self):
-        """Get a database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-        return conn
+        """Check out a pooled database connection (close() returns it to the pool)"""
+        return self.pool.acquire()
+    
+    def get_pool_stats(self):
+        """Get connection pool statistics"""
+        return self.pool.get_stats()
+    
+    def close(self):
+        """Flush queued views, stop background threads and shut down the connection pool"""
+        self.stop_view_writer()
+        self.stop_maintenance()
+        self.pool.close()
+    
+    def checkpoint(self, mode='PASSIVE'):
+        """Copy WAL frames back into the main database file"""
+        conn = self.get_connection()
+        try:
+            row = conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+            return {'busy': row[0], 'log_frames': row[1], 'checkpointed': row[2]}
+        finally:
+            conn.close()
     
-    def init_database(self):
-        """Initialize database tables"""
+    def optimize(self):
+        """Let SQLite refresh query planner statistics where they are stale"""
+        conn = self.get_connection()
+        try:
+            conn.execute('PRAGMA optimize')
+        finally:
+            conn.close()
+    
+    def incremental_vacuum(self, pages=None):
+        """
+        Return up to `pages` free pages to the filesystem.
+        
+        Needs auto_vacuum=INCREMENTAL, which new databases get; older ones
+        switch over with one full vacuum() (`maintenance.py vacuum --full`).
+        Returns the number of pages freed (0 when auto_vacuum is off).
+        """
+        pages = pages or self.vacuum_pages
+        conn = self.get_connection()
+        try:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                return 0
+            before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if not before:
+                return 0
+            # Each step of the pragma frees one page; fetching them all runs it to the end
+            conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+            return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+        finally:
+            conn.close()
+    
+    def vacuum(self):
+        """Rebuild the whole file (blocks writers; also turns on incremental auto_vacuum)"""
+        conn = self.get_connection()
+        try:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+        finally:
+            conn.close()
+    
+    def run_maintenance(self):
+        """
+        One maintenance pass: expire idle sessions, free a batch of pages,
+        checkpoint the WAL, then PRAGMA optimize
+        """
+        try:
+            self.expire_sessions(max_batches=20)
+            self.incremental_vacuum()
+            result = self.checkpoint()
+            self.optimize()
+            return result
+        except sqlite3.Error as e:
+            print(f"Error during database maintenance: {e}")
+            return None
+    
+    def start_maintenance(self, interval=None):
+        """Run run_maintenance() every `interval` seconds on a daemon thread"""
+        interval = interval or self.profile.maintenance_interval
+        if not interval or self._maintenance_thread is not None:
+            return
+        
+        def loop():
+            while not self._maintenance_stop.wait(interval):
+                self.run_maintenance()
+        
+        self._maintenance_stop.clear()
+        self._maintenance_thread = threading.Thread(
+            target=loop, name='db-maintenance', daemon=True
+        )
+        self._maintenance_thread.start()
+    
+    def stop_maintenance(self):
+        """Stop the background maintenance thread, if running"""
+        if self._maintenance_thread is None:
+            return
+        self._maintenance_stop.set()
+        self._maintenance_thread.join(timeout=5)
+        self._maintenance_thread = None
+    
+    def start_view_writer(self):
+        """Queue views and write them in batches on a background thread"""
+        self.view_writer.start()
+    
+    def stop_view_writer(self):
+        """Write any queued views and stop the writer thread"""
+        self.view_writer.stop()
+    
+    def init_database(self, migrate=True):
+        """Initialize database tables, then apply pending migrations unless migrate=False"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # Lets maintenance hand free pages back a batch at a time. Only takes
+        # effect on an empty file (or after a full VACUUM), so it has to come
+        # before journal_mode, which writes the file header
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        # journal_mode is stored in the database file, so it only needs setting once
+        cursor.execute(f'PRAGMA journal_mode = {self.profile.journal_mode}')
+        
         # Images table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS images (
@@ -83,161 +531,707 @@ class Database:
         # Create indexes for better performance
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_images_status ON images(status)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_bias_tags_image ON bias_tags(image_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_image_views_session ON image_views(user_session)')
         
         conn.commit()
-        conn.close()
+        
+        # Later schema changes are versioned migrations
+        try:
+            if migrate:
+                for version, description in migrations.migrate(conn):
+                    print(f"Applied migration {version}: {description}")
+        finally:
+            conn.close()
         
         print("Database initialized successfully")
     
-    def add_images(self, images_data):
+    def add_images(self, images_data, on_duplicate='keep'):
         """Add multiple images to the database"""
+        result = self.import_images(images_data, on_duplicate=on_duplicate)
+        
+        print(f"Added {result['added']} new images to database")
+        if result['duplicates']:
+            print(f"Found {result['duplicates']} near-duplicate images ({on_duplicate})")
+        return result['added']
+    
+    @staticmethod
+    def _image_row(img):
+        """Build the images-table parameter tuple for one image record"""
+        tags = img.get('tags', [])
+        return (
+            img['id'],
+            img['url'],
+            img.get('prompt', ''),
+            json.dumps(tags),
+            img.get('source', 'unknown'),
+            img.get('phash'),
+            Database._image_payload(img['id'], img['url'], img.get('prompt', ''), tags,
+                                    img.get('source', 'unknown'))
+        )
+    
+    @staticmethod
+    def _image_payload(image_id, url, prompt, tags, source):
+        """The JSON the tagging UI receives for an image, serialized once at import"""
+        return json.dumps({
+            'id': image_id,
+            'url': url,
+            'prompt': prompt,
+            'tags': tags,
+            'source': source,
+        }, ensure_ascii=False, separators=(',', ':'))
+    
+    def import_images(self, images, chunk_size=5000, progress=None, on_duplicate='keep',
+                      max_distance=image_hash.DEFAULT_MAX_DISTANCE, hash_workers=None):
+        """
+        Insert images from any iterable (list, generator, streaming reader).
+        
+        Rows are buffered into chunks of `chunk_size` and each chunk is written
+        with one executemany inside its own transaction, so memory stays
+        bounded however large the source is. `progress`, if given, is called
+        with the running totals after every chunk.
+        
+        Images with a local file get a perceptual hash (computed in a process
+        pool). `on_duplicate` decides what happens to an image within
+        `max_distance` bits of one already stored or earlier in the import:
+        'keep' inserts it anyway, 'skip' drops it and 'merge' drops it but
+        adds its tags to the matching image. Returns a dict with the number
+        of rows read, added (new ids), skipped (malformed) and duplicates.
+        """
+        if on_duplicate not in ('keep', 'skip', 'merge'):
+            raise ValueError(f"on_duplicate must be 'keep', 'skip' or 'merge', not {on_duplicate!r}")
+        
+        totals = {'rows': 0, 'added': 0, 'skipped': 0, 'duplicates': 0}
+        index = self.load_hash_index(max_distance) if on_duplicate != 'keep' else None
+        pool = None
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        added_count = 0
-        for img in images_data:
-            try:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO images (id, url, prompt, tags, source)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    img['id'],
-                    img['url'],
-                    img.get('prompt', ''),
-                    json.dumps(img.get('tags', [])),
-                    img.get('source', 'unknown')
-                ))
-                if cursor.rowcount > 0:
-                    added_count += 1
-            except Exception as e:
-                print(f"Error adding image {img.get('id')}: {e}")
+        def fingerprint(batch):
+            nonlocal pool
+            todo = image_hash.records_to_hash(img for img, _ in batch)
+            if not todo:
+                return batch
+            if pool is None:
+                pool = ProcessPoolExecutor(max_workers=hash_workers)
+            hashes = image_hash.hash_files([path for _, path in todo], executor=pool)
+            for (img, _), value in zip(todo, hashes):
+                if value:
+                    img['phash'] = value
+            return [(img, self._image_row(img)) for img, _ in batch]
         
-        conn.commit()
-        conn.close()
+        def dedupe(batch):
+            kept = []
+            pending = {}
+            merges = {}
+            for img, row in batch:
+                value = image_hash.from_hex(img['phash']) if img.get('phash') else None
+                match = index.nearest(value) if value is not None else None
+                if match and match[1] != img['id']:
+                    totals['duplicates'] += 1
+                    if on_duplicate == 'merge':
+                        merges.setdefault(match[1], []).extend(img.get('tags', []))
+                    continue
+                if value is not None:
+                    index.add(value, img['id'])
+                pending[img['id']] = len(kept)
+                kept.append((img, row))
+            
+            # Fold the duplicates' tags into the images they duplicate
+            for image_id, tags in merges.items():
+                if image_id in pending:
+                    position = pending[image_id]
+                    img = kept[position][0]
+                    img['tags'] = self._merge_tags(img.get('tags', []), tags)
+                    kept[position] = (img, self._image_row(img))
+                else:
+                    self._merge_stored_tags(conn, image_id, tags)
+            return kept
+        
+        def flush(batch):
+            batch = fingerprint(batch)
+            if index is not None:
+                batch = dedupe(batch)
+            
+            # Normalized tags for ids that aren't stored yet (re-imported ids keep their tags)
+            conn.executemany('''
+                INSERT OR IGNORE INTO image_tags (image_id, tag)
+                SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM images WHERE id = ?)
+            ''', [(img['id'], tag, img['id'])
+                  for img, _ in batch for tag in self._tag_list(img.get('tags'))])
+            
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO images (id, url, prompt, tags, source, phash, payload)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [row for _, row in batch])
+            totals['added'] += conn.total_changes - before
+            conn.commit()
+            if progress:
+                progress(dict(totals))
+        
+        try:
+            batch = []
+            for img in images:
+                totals['rows'] += 1
+                try:
+                    batch.append((img, self._image_row(img)))
+                except Exception as e:
+                    totals['skipped'] += 1
+                    image_id = img.get('id') if isinstance(img, dict) else None
+                    print(f"Error adding image {image_id}: {e}")
+                    continue
+                
+                if len(batch) >= chunk_size:
+                    flush(batch)
+                    batch = []
+            
+            if batch:
+                flush(batch)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+            if pool is not None:
+                pool.shutdown()
         
-        print(f"Added {added_count} new images to database")
-        return added_count
+        if totals['added'] or totals['duplicates']:
+            self.stats_cache.invalidate()
+        return totals
+    
+    @staticmethod
+    def _tag_list(tags):
+        """Distinct string tags from a record's tags value"""
+        if not isinstance(tags, list):
+            return []
+        return list(dict.fromkeys(tag for tag in tags if isinstance(tag, str)))
+    
+    @staticmethod
+    def _merge_tags(tags, extra_tags):
+        """tags with extra_tags appended (no repeats)"""
+        merged = list(tags)
+        for tag in extra_tags:
+            if tag not in merged:
+                merged.append(tag)
+        return merged
+    
+    def _merge_stored_tags(self, conn, image_id, extra_tags):
+        """Add tags to a stored image, keeping its tags, payload and image_tags rows in step"""
+        row = conn.execute('''
+            SELECT id, url, prompt, tags, source FROM images WHERE id = ?
+        ''', (image_id,)).fetchone()
+        if row is None:
+            return
+        
+        tags = self._merge_tags(json.loads(row['tags']) if row['tags'] else [], extra_tags)
+        conn.execute('''
+            UPDATE images SET tags = ?, payload = ? WHERE id = ?
+        ''', (
+            json.dumps(tags),
+            self._image_payload(row['id'], row['url'], row['prompt'], tags, row['source']),
+            image_id,
+        ))
+        conn.executemany(
+            'INSERT OR IGNORE INTO image_tags (image_id, tag) VALUES (?, ?)',
+            [(image_id, tag) for tag in self._tag_list(tags)]
+        )
+    
+    def load_hash_index(self, max_distance=image_hash.DEFAULT_MAX_DISTANCE):
+        """Hamming index of the perceptual hashes of all active images, for duplicate lookups"""
+        index = image_hash.HammingIndex(max_distance)
+        for image_id, value in self.iter_phashes():
+            index.add(value, image_id)
+        return index
+    
+    def iter_phashes(self):
+        """(image id, hash as int) for every active image that has been hashed"""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT id, phash FROM images
+                WHERE phash IS NOT NULL AND status = 'active'
+                ORDER BY rowid
+            ''').fetchall()
+        finally:
+            conn.close()
+        for row in rows:
+            yield row['id'], image_hash.from_hex(row['phash'])
+    
+    @staticmethod
+    def image_payload(image):
+        """Pre-serialized JSON for an images row (built on the fly for rows without one)"""
+        if image.get('payload'):
+            return image['payload']
+        try:
+            tags = json.loads(image['tags']) if image['tags'] else []
+        except (json.JSONDecodeError, TypeError):
+            tags = []
+        return Database._image_payload(image['id'], image['url'], image['prompt'], tags, image['source'])
+    
+    def get_images_by_tag(self, tag, limit=100, status='active'):
+        """Images carrying an imported tag (e.g. 'woman'), newest first"""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT i.* FROM image_tags t
+                JOIN images i ON i.id = t.image_id
+                WHERE t.tag = ? AND i.status = ?
+                ORDER BY i.rowid DESC
+                LIMIT ?
+            ''', (tag, status, limit)).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+    
+    def get_tag_counts(self, status='active'):
+        """Number of images per imported tag"""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT t.tag, COUNT(*) AS count FROM image_tags t
+                JOIN images i ON i.id = t.image_id
+                WHERE i.status = ?
+                GROUP BY t.tag
+                ORDER BY count DESC
+            ''', (status,)).fetchall()
+        finally:
+            conn.close()
+        return {row['tag']: row['count'] for row in rows}
+    
+    def set_phashes(self, pairs):
+        """Store (phash, image id) pairs computed after import"""
+        conn = self.get_connection()
+        try:
+            conn.executemany('UPDATE images SET phash = ? WHERE id = ?', pairs)
+            conn.commit()
+        finally:
+            conn.close()
     
     def get_random_unviewed_image(self, session_id):
         """Get a random image that this user hasn't viewed yet"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            images = self._pick_unviewed_images(conn.cursor(), session_id, 1)
+            return images[0] if images else None
+        finally:
+            conn.close()
+    
+    def get_random_unviewed_images(self, session_id, n, exclude=()):
+        """
+        Get up to n distinct random images this user hasn't viewed, skipping
+        the ids in `exclude` (e.g. ones already handed out but not yet viewed).
+        """
+        conn = self.get_connection()
+        try:
+            return self._pick_unviewed_images(conn.cursor(), session_id, n, exclude)
+        finally:
+            conn.close()
+    
+    def _pick_unviewed_images(self, cursor, session_id, n, exclude=()):
+        """
+        Pick eligible images without sorting the whole table.
         
-        cursor.execute('''
-            SELECT i.* FROM images i
-            WHERE i.status = 'active'
-            AND i.id NOT IN (
-                SELECT image_id FROM image_views
-                WHERE user_session = ?
-            )
-            ORDER BY RANDOM()
-            LIMIT 1
-        ''', (session_id,))
+        Rowids of the images table are drawn uniformly at random and looked up
+        by primary key; the drawn rowids that are active and unseen by this
+        session win. That is rejection sampling, so every eligible image is
+        equally likely, and each probe round is a single query costing a few
+        index lookups no matter how many images or views there are.
+        
+        Only when a session has seen (or the lifecycle has deleted) almost
+        everything do the probes keep missing; then we fall back to scanning
+        forward from a random rowid, which is slightly biased towards images
+        that follow gaps but still avoids the full sort.
+        """
+        cursor.execute('SELECT MAX(rowid) FROM images')
+        max_rowid = cursor.fetchone()[0]
+        if not max_rowid:
+            return []
         
-        row = cursor.fetchone()
-        conn.close()
+        exclude = set(exclude)
+        picked = {}
+        probes = max(self.SELECTION_PROBES, n * 4)
+        for _ in range(self.SELECTION_PROBE_ROUNDS):
+            rowids = [random.randint(1, max_rowid) for _ in range(probes)]
+            placeholders = ','.join('?' * len(rowids))
+            cursor.execute(f'''
+                SELECT i.rowid AS probe_rowid, i.* FROM images i
+                WHERE i.rowid IN ({placeholders})
+                AND i.status = 'active'
+                AND NOT EXISTS (
+                    SELECT 1 FROM image_views v
+                    WHERE v.image_id = i.id AND v.user_session = ?
+                )
+            ''', rowids + [session_id])
+            found = {row['probe_rowid']: row for row in cursor.fetchall()}
+            for rowid in rowids:
+                row = found.get(rowid)
+                if row and row['id'] not in exclude and rowid not in picked:
+                    picked[rowid] = self._strip_probe_rowid(row)
+                    if len(picked) == n:
+                        return list(picked.values())
         
-        if row:
-            return dict(row)
-        return None
+        start = random.randint(1, max_rowid)
+        for condition in ('i.rowid >= ?', 'i.rowid < ?'):
+            cursor.execute(f'''
+                SELECT i.rowid AS probe_rowid, i.* FROM images i
+                WHERE {condition}
+                AND i.status = 'active'
+                AND NOT EXISTS (
+                    SELECT 1 FROM image_views v
+                    WHERE v.image_id = i.id AND v.user_session = ?
+                )
+                ORDER BY i.rowid
+                LIMIT ?
+            ''', (start, session_id, n + len(exclude) + len(picked)))
+            for row in cursor.fetchall():
+                if row['id'] not in exclude and row['probe_rowid'] not in picked:
+                    picked[row['probe_rowid']] = self._strip_probe_rowid(row)
+                    if len(picked) == n:
+                        return list(picked.values())
+        
+        return list(picked.values())
+    
+    @staticmethod
+    def _strip_probe_rowid(row):
+        """Drop the helper rowid column from a probed images row"""
+        image = dict(row)
+        image.pop('probe_rowid', None)
+        return image
     
     def record_view(self, image_id, session_id):
-        """Record that a user viewed an image"""
+        """
+        Record that a user viewed an image.
+        
+        The image_views row is inserted straight away, so no worker process
+        serves the image to this session again; the counter updates go to the
+        view writer, which applies them in batches while it runs.
+        """
+        try:
+            conn = self.get_connection()
+            try:
+                # INSERT OR IGNORE only inserts for a first-time viewer, so the
+                # rowcount tells us whether unique_viewers goes up
+                cursor = conn.execute('''
+                    INSERT OR IGNORE INTO image_views (image_id, user_session)
+                    VALUES (?, ?)
+                ''', (image_id, session_id))
+                new_viewer = cursor.rowcount > 0
+                conn.commit()
+            finally:
+                conn.close()
+            self.view_writer.record(image_id, session_id, new_viewer)
+        except Exception as e:
+            print(f"Error recording view: {e}")
+    
+    def record_views(self, views):
+        """
+        Write a batch of (image_id, session_id) views, rows and counters, in
+        one transaction. Returns the ids of images that were soft-deleted;
+        rolls back and re-raises on error.
+        """
+        views = list(views)
+        if not views:
+            return []
+        
         conn = self.get_connection()
         cursor = conn.cursor()
-        
         try:
-            # Add view record
-            cursor.execute('''
-                INSERT OR IGNORE INTO image_views (image_id, user_session)
-                VALUES (?, ?)
-            ''', (image_id, session_id))
-            
-            # Update image view count
-            cursor.execute('''
-                UPDATE images
-                SET view_count = view_count + 1,
-                    unique_viewers = (
-                        SELECT COUNT(DISTINCT user_session)
-                        FROM image_views
-                        WHERE image_id = ?
-                    )
-                WHERE id = ?
-            ''', (image_id, image_id))
-            
-            # Check if image should be deleted (5 views, no bias tags)
-            cursor.execute('''
-                SELECT unique_viewers, bias_tag_count
-                FROM images
-                WHERE id = ?
-            ''', (image_id,))
-            
-            result = cursor.fetchone()
-            if result and result['unique_viewers'] >= 5 and result['bias_tag_count'] == 0:
+            counted = []
+            for image_id, session_id in views:
                 cursor.execute('''
-                    UPDATE images
-                    SET status = 'deleted', deleted_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (image_id,))
-                print(f"Image {image_id} marked as deleted (5 views, no bias tags)")
-            
+                    INSERT OR IGNORE INTO image_views (image_id, user_session)
+                    VALUES (?, ?)
+                ''', (image_id, session_id))
+                counted.append((image_id, session_id, cursor.rowcount > 0))
+            deleted = self._apply_view_counts(cursor, counted)
             conn.commit()
-        except Exception as e:
-            print(f"Error recording view: {e}")
+        except Exception:
             conn.rollback()
+            raise
         finally:
             conn.close()
+        
+        self._views_applied(deleted)
+        return deleted
+    
+    def record_view_counts(self, views):
+        """
+        Apply the counter side of (image_id, session_id, new_viewer) views whose
+        image_views rows are already written, in one transaction. Returns the
+        ids of images that were soft-deleted; rolls back and re-raises on error.
+        """
+        views = list(views)
+        if not views:
+            return []
+        
+        conn = self.get_connection()
+        try:
+            deleted = self._apply_view_counts(conn.cursor(), views)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        self._views_applied(deleted)
+        return deleted
+    
+    def _views_applied(self, deleted):
+        for image_id in deleted:
+            print(f"Image {image_id} marked as deleted (5 views, no bias tags)")
+        self.stats_cache.invalidate()
+    
+    def _apply_view_counts(self, cursor, views):
+        """
+        Counter, session-activity and lifecycle updates for a batch of
+        (image_id, session_id, new_viewer) views. Counters get one UPDATE per
+        image rather than per view, and the lifecycle rule (5 unique viewers,
+        no bias tags) is checked for the whole batch in a single UPDATE.
+        """
+        # image_id -> [views, new unique viewers]
+        counts = {}
+        for image_id, _, new_viewer in views:
+            image_counts = counts.setdefault(image_id, [0, 0])
+            image_counts[0] += 1
+            image_counts[1] += 1 if new_viewer else 0
+        
+        cursor.executemany('''
+            UPDATE images
+            SET view_count = view_count + ?,
+                unique_viewers = unique_viewers + ?
+            WHERE id = ?
+        ''', [(total, new, image_id) for image_id, (total, new) in counts.items()])
+        
+        # Viewing counts as activity for session expiry
+        cursor.executemany('''
+            INSERT INTO user_sessions (session_id) VALUES (?)
+            ON CONFLICT(session_id) DO UPDATE SET last_active = CURRENT_TIMESTAMP
+        ''', [(session_id,) for session_id in {session_id for _, session_id, _ in views}])
+        
+        # Delete images that now have 5 unique viewers and no bias tags
+        ids = list(counts)
+        deleted = []
+        for offset in range(0, len(ids), 500):
+            chunk = ids[offset:offset + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'''
+                UPDATE images
+                SET status = 'deleted', deleted_at = CURRENT_TIMESTAMP
+                WHERE id IN ({placeholders})
+                AND status = 'active'
+                AND unique_viewers >= 5
+                AND bias_tag_count = 0
+                RETURNING id
+            ''', chunk)
+            deleted.extend(row[0] for row in cursor.fetchall())
+        return deleted
     
     def add_bias_tag(self, image_id, session_id, bias_type, notes=''):
         """Add a bias tag to an image"""
+        result = self.add_bias_tags(image_id, session_id, [bias_type], notes)
+        return result.get(bias_type) in ('added', 'duplicate')
+    
+    def add_bias_tags(self, image_id, session_id, bias_types, notes=''):
+        """
+        Add several bias tags to an image in one transaction.
+        
+        Returns a dict mapping each requested bias type to 'added',
+        'duplicate' (this session already tagged it), 'invalid' or 'error'.
+        """
+        results = {}
+        requested = []
+        for bias_type in bias_types:
+            if not isinstance(bias_type, str) or not bias_type.strip():
+                results[str(bias_type)] = 'invalid'
+            elif bias_type not in results:
+                results[bias_type] = None
+                requested.append(bias_type)
+        
+        if not requested:
+            return results
+        
         conn = self.get_connection()
         cursor = conn.cursor()
+        placeholders = ','.join('?' * len(requested))
         
         try:
-            cursor.execute('''
+            # Take the write lock up front so the existing-type lookup and the
+            # inserts see the same state
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            # The unary + keeps the planner on the image_id index; without
+            # ANALYZE stats it would otherwise pick idx_bias_tags_type
+            cursor.execute(f'''
+                SELECT bias_type, MAX(user_session = ?) AS mine
+                FROM bias_tags
+                WHERE image_id = ? AND +bias_type IN ({placeholders})
+                GROUP BY bias_type
+            ''', [session_id, image_id] + requested)
+            existing = {row['bias_type']: row['mine'] for row in cursor.fetchall()}
+            
+            cursor.executemany('''
                 INSERT OR IGNORE INTO bias_tags (image_id, user_session, bias_type, notes)
                 VALUES (?, ?, ?, ?)
-            ''', (image_id, session_id, bias_type, notes))
+            ''', [(image_id, session_id, bias_type, notes)
+                  for bias_type in requested if not existing.get(bias_type)])
             
-            # Update bias tag count
-            cursor.execute('''
-                UPDATE images
-                SET bias_tag_count = (
-                    SELECT COUNT(DISTINCT bias_type)
-                    FROM bias_tags
-                    WHERE image_id = ?
-                )
-                WHERE id = ?
-            ''', (image_id, image_id))
+            # bias_tag_count counts distinct bias types on the image
+            new_types = sum(1 for bias_type in requested if bias_type not in existing)
+            if new_types:
+                cursor.execute('''
+                    UPDATE images
+                    SET bias_tag_count = bias_tag_count + ?
+                    WHERE id = ?
+                ''', (new_types, image_id))
             
             conn.commit()
-            return True
+            self.stats_cache.invalidate()
+            for bias_type in requested:
+                results[bias_type] = 'duplicate' if existing.get(bias_type) else 'added'
         except Exception as e:
-            print(f"Error adding bias tag: {e}")
+            print(f"Error adding bias tags: {e}")
             conn.rollback()
-            return False
+            for bias_type in requested:
+                results[bias_type] = 'error'
         finally:
             conn.close()
+        
+        return results
     
-    def create_or_get_session(self, session_id):
-        """Create or update a user session"""
+    def reconcile_counters(self):
+        """
+        Rebuild unique_viewers and bias_tag_count from the raw view and tag
+        rows (plus the archived viewers of expired sessions) in one set-based
+        pass, repairing any drift in the incremental counters. Returns the
+        number of images whose counters changed.
+        """
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.execute('''
+                UPDATE images
+                SET unique_viewers = c.viewers,
+                    bias_tag_count = c.bias_types
+                FROM (
+                    SELECT i.id AS image_id,
+                           COALESCE(v.viewers, 0) + COALESCE(a.viewers, 0) AS viewers,
+                           COALESCE(t.bias_types, 0) AS bias_types
+                    FROM images i
+                    LEFT JOIN (
+                        SELECT image_id, COUNT(*) AS viewers
+                        FROM image_views
+                        GROUP BY image_id
+                    ) v ON v.image_id = i.id
+                    LEFT JOIN image_view_archive a ON a.image_id = i.id
+                    LEFT JOIN (
+                        SELECT image_id, COUNT(DISTINCT bias_type) AS bias_types
+                        FROM bias_tags
+                        GROUP BY image_id
+                    ) t ON t.image_id = i.id
+                ) AS c
+                WHERE images.id = c.image_id
+                AND (images.unique_viewers IS NOT c.viewers
+                     OR images.bias_tag_count IS NOT c.bias_types)
+            ''')
+            repaired = cursor.rowcount
+            conn.commit()
+            self.stats_cache.invalidate()
+        finally:
+            conn.close()
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO user_sessions (session_id, last_active)
-            VALUES (?, CURRENT_TIMESTAMP)
-        ''', (session_id,))
+        print(f"Reconciled counters for {repaired} images")
+        return repaired
+    
+    def expire_sessions(self, ttl_days=None, batch_size=None, max_batches=None, pause=migrations.BATCH_PAUSE):
+        """
+        Delete sessions idle for more than ttl_days, a batch at a time.
         
-        conn.commit()
-        conn.close()
+        Each session's view rows are folded into image_view_archive (one
+        viewer count per image) before they are deleted, so unique_viewers
+        stays reconcilable while image_views only holds live sessions. Every
+        batch is its own short write transaction, and the expired sessions
+        are picked inside it, so several workers can run this at once. A
+        session that comes back after expiring starts afresh and can count as
+        a new viewer of images it saw before. Returns counts of sessions and
+        view rows removed.
+        """
+        ttl_days = self.session_ttl_days if ttl_days is None else ttl_days
+        batch_size = batch_size or self.session_cleanup_batch
+        totals = {'sessions': 0, 'views': 0, 'batches': 0}
+        if not ttl_days:
+            return totals
+        
+        conn = self.get_connection()
+        try:
+            while max_batches is None or totals['batches'] < max_batches:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    sessions = [row[0] for row in conn.execute('''
+                        SELECT session_id FROM user_sessions
+                        WHERE last_active < datetime('now', ?)
+                        LIMIT ?
+                    ''', (f'-{ttl_days} days', batch_size))]
+                    if not sessions:
+                        conn.rollback()
+                        break
+                    
+                    placeholders = ','.join('?' * len(sessions))
+                    conn.execute(f'''
+                        INSERT INTO image_view_archive (image_id, viewers)
+                        SELECT image_id, COUNT(*) FROM image_views
+                        WHERE user_session IN ({placeholders})
+                        GROUP BY image_id
+                        ON CONFLICT(image_id) DO UPDATE SET viewers = viewers + excluded.viewers
+                    ''', sessions)
+                    views = conn.execute(f'DELETE FROM image_views WHERE user_session IN ({placeholders})',
+                                         sessions).rowcount
+                    conn.execute(f'DELETE FROM user_sessions WHERE session_id IN ({placeholders})', sessions)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                
+                totals['sessions'] += len(sessions)
+                totals['views'] += views
+                totals['batches'] += 1
+                if pause:
+                    time.sleep(pause)
+        finally:
+            conn.close()
+        
+        if totals['sessions']:
+            print(f"Expired {totals['sessions']} idle sessions, archived {totals['views']} view rows")
+        return totals
     
-    def get_statistics(self):
-        """Get overall statistics"""
+    def create_or_get_session(self, session_id):
+        """Create or update a user session"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        try:
+            cursor.execute('''
+                INSERT INTO user_sessions (session_id) VALUES (?)
+                ON CONFLICT(session_id) DO UPDATE SET last_active = CURRENT_TIMESTAMP
+            ''', (session_id,))
+            
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def get_statistics(self, fresh=False):
+        """Get overall statistics (served from the statistics cache unless fresh=True)"""
+        if fresh:
+            return self._compute_statistics()
+        return self.stats_cache.get()
+    
+    def _compute_statistics(self):
+        """Run the statistics queries against the database"""
+        conn = self.get_connection()
+        try:
+            return self._collect_statistics(conn.cursor())
+        finally:
+            conn.close()
+    
+    def _collect_statistics(self, cursor):
+        """Run the statistics aggregate queries on an open cursor"""
         stats = {}
         
         # Total images
@@ -261,34 +1255,41 @@ class Database:
         ''')
         stats['bias_types'] = [dict(row) for row in cursor.fetchall()]
         
-        # Recently tagged images
-        cursor.execute('''
-            SELECT i.id, i.url, i.prompt, 
-                   GROUP_CONCAT(DISTINCT bt.bias_type) as bias_types
-            FROM images i
-            JOIN bias_tags bt ON i.id = bt.image_id
-            WHERE i.bias_tag_count > 0
-            GROUP BY i.id
-            ORDER BY MAX(bt.created_at) DESC
-            LIMIT 10
-        ''')
-        stats['recent_tagged'] = [dict(row) for row in cursor.fetchall()]
+        # Recently tagged images: walk bias_tags newest first (idx_bias_tags_created)
+        # and stop at the tenth distinct image instead of grouping every tag
+        recent_ids = []
+        for row in cursor.execute('SELECT image_id FROM bias_tags ORDER BY created_at DESC, id DESC'):
+            if row['image_id'] not in recent_ids:
+                recent_ids.append(row['image_id'])
+                if len(recent_ids) == 10:
+                    break
+        recent = {}
+        if recent_ids:
+            placeholders = ','.join('?' * len(recent_ids))
+            cursor.execute(f'''
+                SELECT i.id, i.url, i.prompt,
+                       (SELECT GROUP_CONCAT(DISTINCT bt.bias_type) FROM bias_tags bt
+                        WHERE bt.image_id = i.id) as bias_types
+                FROM images i
+                WHERE i.id IN ({placeholders})
+                AND i.bias_tag_count > 0
+            ''', recent_ids)
+            recent = {row['id']: dict(row) for row in cursor.fetchall()}
+        stats['recent_tagged'] = [recent[image_id] for image_id in recent_ids if image_id in recent]
         
-        # Most tagged image
+        # Most tagged image (idx_images_tagged covers only tagged images)
         cursor.execute('''
             SELECT i.id, i.url, i.prompt, i.bias_tag_count as tag_count,
-                   GROUP_CONCAT(DISTINCT bt.bias_type) as bias_types
+                   (SELECT GROUP_CONCAT(DISTINCT bt.bias_type) FROM bias_tags bt
+                    WHERE bt.image_id = i.id) as bias_types
             FROM images i
-            LEFT JOIN bias_tags bt ON i.id = bt.image_id
             WHERE i.bias_tag_count > 0
-            GROUP BY i.id
             ORDER BY i.bias_tag_count DESC
             LIMIT 1
         ''')
         most_tagged_row = cursor.fetchone()
         stats['most_tagged'] = dict(most_tagged_row) if most_tagged_row else None
         
-        conn.close()
         return stats
     
     def get_image_details(self, image_id):
@@ -296,30 +1297,30 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Get image data
-        cursor.execute('SELECT * FROM images WHERE id = ?', (image_id,))
-        image = cursor.fetchone()
-        
-        if not image:
+        try:
+            # Get image data
+            cursor.execute('SELECT * FROM images WHERE id = ?', (image_id,))
+            image = cursor.fetchone()
+            
+            if not image:
+                return None
+            
+            image_dict = dict(image)
+            
+            # Get bias tags
+            cursor.execute('''
+                SELECT bias_type, COUNT(*) as count
+                FROM bias_tags
+                WHERE image_id = ?
+                GROUP BY bias_type
+            ''', (image_id,))
+            
+            image_dict['bias_tags'] = [dict(row) for row in cursor.fetchall()]
+        finally:
             conn.close()
-            return None
         
-        image_dict = dict(image)
-        
-        # Get bias tags
-        cursor.execute('''
-            SELECT bias_type, COUNT(*) as count
-            FROM bias_tags
-            WHERE image_id = ?
-            GROUP BY bias_type
-        ''', (image_id,))
-        
-        image_dict['bias_tags'] = [dict(row) for row in cursor.fetchall()]
-        
-        conn.close()
         return image_dict
 
-
 if __name__ == "__main__":
     # Test the database
     db = Database()
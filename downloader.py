@@ -0,0 +1,190 @@
+"""
+Concurrent media downloader for the scrapers
+
+Downloads run on a bounded thread pool sharing one keep-alive requests
+Session, with a per-host concurrency cap, retry with exponential backoff,
+resumable partial downloads (HTTP Range) and atomic temp-file-then-rename
+writes, so an interrupted run never leaves a truncated image in images/.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+MEDIA_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.mp4', '.webm', '.mov']
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# Statuses worth retrying; other 4xx responses fail straight away
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class DownloadError(Exception):
+    """A download failed and should not be retried"""
+
+
+class MediaDownloader:
+    def __init__(self, dest_dir='images', workers=8, per_host=4, retries=3,
+                 backoff=0.5, timeout=30, chunk_size=64 * 1024, session=None, verbose=True):
+        self.dest_dir = dest_dir
+        self.workers = workers
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.verbose = verbose
+        self.session = session or self._make_session()
+        
+        self._host_slots = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'downloaded': 0,
+            'skipped': 0,
+            'failed': 0,
+            'resumed': 0,
+            'retries': 0,
+            'bytes': 0,
+            'seconds': 0.0,
+        }
+        
+        os.makedirs(dest_dir, exist_ok=True)
+    
+    def _make_session(self):
+        """Keep-alive session whose connection pool matches the worker count"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['User-Agent'] = USER_AGENT
+        return session
+    
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+    
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+    
+    def _host_slot(self, url):
+        """Semaphore limiting concurrent downloads from one host"""
+        host = urlparse(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+        return slot
+    
+    def filepath_for(self, url, image_id):
+        """Local path a URL will be saved to"""
+        ext = os.path.splitext(urlparse(url).path)[1]
+        if not ext or ext not in MEDIA_EXTENSIONS:
+            ext = '.jpg'  # default
+        return os.path.join(self.dest_dir, f"{image_id}{ext}")
+    
+    def download(self, url, image_id):
+        """Download one file, returning its local path or None on failure"""
+        filepath = self.filepath_for(url, image_id)
+        filename = os.path.basename(filepath)
+        
+        # Check if already downloaded
+        if os.path.exists(filepath):
+            self._count('skipped')
+            self._log(f"  Already downloaded: {filename}")
+            return filepath
+        
+        for attempt in range(self.retries + 1):
+            try:
+                with self._host_slot(url):
+                    self._fetch(url, filepath)
+                self._count('downloaded')
+                self._log(f"  ✓ Downloaded: {filename}")
+                return filepath
+            except DownloadError as e:
+                self._log(f"  ✗ Download failed: {e}")
+                break
+            except (requests.RequestException, OSError) as e:
+                if attempt == self.retries:
+                    self._log(f"  ✗ Download failed after {attempt + 1} attempts: {e}")
+                    break
+                self._count('retries')
+                # Exponential backoff with jitter so retries don't stampede
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+        
+        self._count('failed')
+        return None
+    
+    def _fetch(self, url, filepath):
+        """Stream url into filepath.part, resuming it if present, then rename"""
+        part_path = filepath + '.part'
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        
+        with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 416:
+                # Our partial file doesn't match the server's; start over
+                os.remove(part_path)
+                raise requests.RequestException("Stale partial download discarded")
+            if response.status_code in RETRY_STATUSES:
+                raise requests.RequestException(f"HTTP {response.status_code}")
+            if response.status_code >= 400:
+                raise DownloadError(f"HTTP {response.status_code}")
+            
+            if offset and response.status_code == 206:
+                mode = 'ab'
+                self._count('resumed')
+            else:
+                mode = 'wb'  # Server ignored the Range header
+            
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+                    self._count('bytes', len(chunk))
+        
+        os.replace(part_path, filepath)
+    
+    def download_all(self, items):
+        """
+        Download (url, image_id) pairs concurrently.
+        Returns a dict mapping image_id to local path (None if it failed).
+        """
+        items = list(items)
+        results = {}
+        start = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.download, url, image_id): image_id
+                       for url, image_id in items}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        
+        self._count('seconds', time.perf_counter() - start)
+        return results
+    
+    def throughput(self):
+        """Summary of what has been downloaded so far"""
+        with self._lock:
+            stats = dict(self.stats)
+        seconds = stats['seconds'] or 0.0
+        stats['mb_per_sec'] = stats['bytes'] / seconds / 1e6 if seconds else 0.0
+        stats['files_per_sec'] = stats['downloaded'] / seconds if seconds else 0.0
+        return stats
+    
+    def report(self):
+        """Print a one-line throughput summary"""
+        stats = self.throughput()
+        print(f"Downloaded {stats['downloaded']} files ({stats['bytes'] / 1e6:.1f} MB) "
+              f"in {stats['seconds']:.1f}s - {stats['mb_per_sec']:.2f} MB/s, "
+              f"{stats['files_per_sec']:.1f} files/s; "
+              f"{stats['skipped']} already present, {stats['failed']} failed, "
+              f"{stats['resumed']} resumed, {stats['retries']} retries")
+    
+    def close(self):
+        """Close the pooled HTTP connections"""
+        self.session.close()
@@ -0,0 +1,43 @@
+"""
+Gunicorn settings for AI Image Bias Tagger
+
+The app is imported once in the master (preload_app) and forked into
+workers, so templates, routes and the secret key are shared and each worker
+starts serving immediately. SQLite connections are opened lazily inside each
+worker, never in the master, so none cross the fork.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Requests spend much of their time waiting on SQLite and file I/O, so each
+# process runs a few threads on top of one process per core
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+preload_app = True
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so slow leaks can't build up
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """Background threads don't survive fork, so start them in each worker"""
+    from app import start_background_tasks
+    from wsgi import app
+    start_background_tasks(app)
+
+
+def worker_exit(server, worker):
+    """Write views still queued in this worker before it goes away"""
+    from wsgi import app
+    app.extensions['db'].stop_view_writer()
@@ -0,0 +1,240 @@
+"""
+Perceptual hashing for spotting duplicate images
+
+Each image gets a 64-bit difference hash (dHash): the picture is shrunk to
+9x8 greyscale and every bit records whether a pixel is brighter than its
+right-hand neighbour. Re-encoded, resized or lightly recompressed copies of
+the same picture end up within a few bits of each other, so duplicates are
+found by Hamming distance. Hashes are computed in a process pool and looked
+up in a multi-index hash table, so a lookup only compares against the few
+stored hashes that share an exact chunk with it instead of all of them.
+
+Usage:
+    python image_hash.py backfill            # hash stored images that have no phash yet
+    python image_hash.py duplicates          # list groups of near-duplicate images
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageChops, ImageFilter
+
+HASH_SIZE = 8
+
+# Max differing bits for two images to count as the same picture
+DEFAULT_MAX_DISTANCE = 4
+
+# Grey-level difference from the corner pixel that counts as content when trimming borders
+BORDER_THRESHOLD = 24
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
+
+
+def dhash(path, hash_size=HASH_SIZE):
+    """64-bit difference hash of an image file, as an int"""
+    with Image.open(path) as image:
+        # Let the JPEG decoder downscale while decoding; much cheaper than a full decode
+        image.draft('L', (256, 256))
+        grey = image.convert('L')
+    
+    # Trim flat borders (e.g. the dark page around a screenshot) so they don't dominate the hash
+    grey.thumbnail((256, 256))
+    background = Image.new('L', grey.size, grey.getpixel((0, 0)))
+    mask = ImageChops.difference(grey, background).point(lambda p: 255 if p > BORDER_THRESHOLD else 0)
+    # Erode away thin strokes like captions and buttons around the picture
+    mask = mask.filter(ImageFilter.MinFilter(5))
+    box = mask.getbbox()
+    if box and (box[2] - box[0]) * (box[3] - box[1]) < grey.width * grey.height:
+        grey = grey.crop(box)
+    
+    small = grey.resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def to_hex(value):
+    """Fixed-width hex form used in the database (64-bit values don't fit SQLite's INTEGER)"""
+    return f'{value:016x}'
+
+
+def from_hex(text):
+    return int(text, 16)
+
+
+def local_image_path(record):
+    """Local file behind an image record, or None for remote/missing images"""
+    for candidate in (record.get('local_file'), record.get('url')):
+        if not candidate or '://' in candidate:
+            continue
+        # Scraped records may carry Windows paths (images\x.jpg)
+        path = candidate.replace('\\', '/').lstrip('/')
+        if path.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(path):
+            return path
+    return None
+
+
+def _hash_worker(path):
+    try:
+        return to_hex(dhash(path))
+    except Exception:
+        # Unreadable or not actually an image (e.g. a video saved as .jpg)
+        return None
+
+
+def hash_files(paths, executor=None, workers=None):
+    """Hex hashes for paths (None where a file can't be read), computed in a process pool"""
+    paths = list(paths)
+    if not paths:
+        return []
+    if executor is not None:
+        return list(executor.map(_hash_worker, paths, chunksize=16))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_hash_worker, paths, chunksize=16))
+
+
+def records_to_hash(records):
+    """(record, local path) for records with a local image and no hash yet"""
+    todo = []
+    for record in records:
+        if not record.get('phash'):
+            path = local_image_path(record)
+            if path:
+                todo.append((record, path))
+    return todo
+
+
+def fingerprint_records(records, executor=None, workers=None):
+    """Fill in record['phash'] for records with a local image and no hash yet"""
+    todo = records_to_hash(records)
+    hashes = hash_files([path for _, path in todo], executor=executor, workers=workers)
+    for (record, _), value in zip(todo, hashes):
+        if value:
+            record['phash'] = value
+    return len(todo)
+
+
+class HammingIndex:
+    """
+    Multi-index hash table for "which stored hashes are within d bits?".
+    
+    Each hash is cut into max_distance + 1 chunks and filed under every
+    chunk. Two hashes differing in at most max_distance bits must agree
+    exactly on at least one chunk (pigeonhole), so a search only compares
+    against the hashes sharing a chunk with the query instead of all of them.
+    """
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, bits=HASH_SIZE * HASH_SIZE):
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        self._chunks = []
+        shift = 0
+        for n in range(chunks):
+            width = bits // chunks + (1 if n < bits % chunks else 0)
+            self._chunks.append((shift, (1 << width) - 1))
+            shift += width
+        self._tables = [{} for _ in self._chunks]
+        self._values = []
+        self._items = []
+    
+    def add(self, value, item):
+        """Insert a hash (int) with an associated item, e.g. an image id"""
+        index = len(self._values)
+        self._values.append(value)
+        self._items.append(item)
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table.setdefault((value >> shift) & mask, []).append(index)
+    
+    def search(self, value, max_distance=None):
+        """(distance, item) pairs within max_distance of value, nearest first"""
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        values = self._values
+        seen = set()
+        matches = []
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            for index in table.get((value >> shift) & mask, ()):
+                if index in seen:
+                    continue
+                seen.add(index)
+                distance = (value ^ values[index]).bit_count()
+                if distance <= max_distance:
+                    matches.append((distance, self._items[index]))
+        matches.sort(key=lambda match: match[0])
+        return matches
+    
+    def nearest(self, value, max_distance=None):
+        """Closest (distance, item) within max_distance, or None"""
+        matches = self.search(value, max_distance)
+        return matches[0] if matches else None
+    
+    def __len__(self):
+        return len(self._values)
+
+
+def backfill(db, workers=None, chunk_size=2000):
+    """Hash stored images that have a local file but no phash"""
+    conn = db.get_connection()
+    try:
+        rows = conn.execute('SELECT id, url FROM images WHERE phash IS NULL').fetchall()
+    finally:
+        conn.close()
+    
+    records = [{'id': row['id'], 'url': row['url']} for row in rows]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for offset in range(0, len(records), chunk_size):
+            chunk = records[offset:offset + chunk_size]
+            fingerprint_records(chunk, executor=pool)
+            db.set_phashes([(r['phash'], r['id']) for r in chunk if r.get('phash')])
+    
+    hashed = sum(1 for r in records if r.get('phash'))
+    return {'candidates': len(records), 'hashed': hashed, 'seconds': time.perf_counter() - start}
+
+
+def find_duplicates(db, max_distance=DEFAULT_MAX_DISTANCE):
+    """Groups of active image ids whose hashes are within max_distance of the group's first image"""
+    index = HammingIndex(max_distance)
+    groups = {}
+    for image_id, value in db.iter_phashes():
+        match = index.nearest(value)
+        if match:
+            groups.setdefault(match[1], []).append(image_id)
+        else:
+            index.add(value, image_id)
+    return [[canonical] + others for canonical, others in groups.items()]
+
+
+def main():
+    from database import Database
+    
+    parser = argparse.ArgumentParser(description="Perceptual hashes for duplicate detection")
+    parser.add_argument('command', choices=['backfill', 'duplicates'])
+    parser.add_argument('--db', default='data/bias_tagger.db', help="Path to the SQLite database")
+    parser.add_argument('--workers', type=int, default=None, help="Hashing processes (default: CPU count)")
+    parser.add_argument('--distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help=f"Max differing bits for a duplicate (default: {DEFAULT_MAX_DISTANCE})")
+    args = parser.parse_args()
+    
+    db = Database(args.db)
+    try:
+        if args.command == 'backfill':
+            totals = backfill(db, workers=args.workers)
+            print(f"✓ Hashed {totals['hashed']} of {totals['candidates']} images "
+                  f"in {totals['seconds']:.1f}s")
+        else:
+            groups = find_duplicates(db, args.distance)
+            for group in groups:
+                print(f"{group[0]}: {', '.join(group[1:])}")
+            print(f"\n{len(groups)} images have near-duplicates")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
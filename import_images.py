@@ -0,0 +1,130 @@
+"""
+Streaming bulk importer for scraped image dumps
+
+Reads a JSON array (scraped_images*.json) or a JSON Lines file one record at
+a time and feeds the database in fixed-size chunks, so multi-million-row
+dumps import in bounded memory.
+
+Usage:
+    python import_images.py scraped_images.json
+    python import_images.py dump.jsonl --chunk-size 20000
+"""
+import argparse
+import json
+import time
+from database import Database
+
+
+def iter_json_records(path, buffer_size=1 << 16):
+    """Yield records from a JSON array or JSON Lines file without loading it whole"""
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(buffer_size)
+        stripped = head.lstrip('\ufeff \t\r\n')
+        
+        if stripped.startswith('['):
+            yield from _iter_json_array(f, stripped, buffer_size)
+        else:
+            yield from _iter_json_lines(f, head.lstrip('\ufeff'))
+
+
+def _iter_json_lines(f, head):
+    """Yield one record per non-blank line"""
+    # The first chunk may end mid-line, so stitch it to the rest of that line
+    first_lines = (head + f.readline()).splitlines()
+    for line in first_lines:
+        if line.strip():
+            yield json.loads(line)
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _iter_json_array(f, buf, buffer_size):
+    """Incrementally decode the elements of a top-level JSON array"""
+    decoder = json.JSONDecoder()
+    pos = 1  # Skip the opening '['
+    
+    while True:
+        # Skip whitespace and separators, reading more input as needed
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buf):
+            more = f.read(buffer_size)
+            if not more:
+                raise ValueError("Unexpected end of file inside JSON array")
+            buf, pos = buf[pos:] + more, 0
+            continue
+        
+        if buf[pos] == ']':
+            return
+        
+        try:
+            record, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # Most likely the record straddles the buffer boundary
+            more = f.read(buffer_size)
+            if not more:
+                raise
+            buf, pos = buf[pos:] + more, 0
+            continue
+        
+        yield record
+        pos = end
+        
+        # Drop consumed text so the buffer stays about one chunk long
+        if pos > buffer_size:
+            buf, pos = buf[pos:], 0
+
+
+def import_file(path, db, chunk_size=5000, quiet=False, on_duplicate='keep'):
+    """Stream a dump file into the database and report throughput"""
+    start = time.perf_counter()
+    
+    def report(totals):
+        elapsed = time.perf_counter() - start
+        rate = totals['rows'] / elapsed if elapsed > 0 else 0
+        print(f"  {totals['rows']:,} rows read, {totals['added']:,} added "
+              f"({rate:,.0f} rows/sec)")
+    
+    totals = db.import_images(
+        iter_json_records(path),
+        chunk_size=chunk_size,
+        progress=None if quiet else report,
+        on_duplicate=on_duplicate,
+    )
+    
+    elapsed = time.perf_counter() - start
+    totals['seconds'] = elapsed
+    totals['rows_per_sec'] = totals['rows'] / elapsed if elapsed > 0 else 0
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import scraped images into the database")
+    parser.add_argument('path', help="JSON array or JSON Lines file of image records")
+    parser.add_argument('--db', default='data/bias_tagger.db', help="Path to the SQLite database")
+    parser.add_argument('--chunk-size', type=int, default=5000,
+                        help="Rows per executemany/transaction (default: 5000)")
+    parser.add_argument('--quiet', action='store_true', help="Only print the final summary")
+    parser.add_argument('--on-duplicate', choices=['keep', 'skip', 'merge'], default='keep',
+                        help="What to do with near-duplicates of stored images (default: keep)")
+    args = parser.parse_args()
+    
+    db = Database(args.db)
+    try:
+        print(f"Importing {args.path}...")
+        totals = import_file(args.path, db, chunk_size=args.chunk_size, quiet=args.quiet,
+                             on_duplicate=args.on_duplicate)
+    finally:
+        db.close()
+    
+    print(f"\n✓ Imported {totals['added']:,} new images from {totals['rows']:,} rows "
+          f"in {totals['seconds']:.1f}s ({totals['rows_per_sec']:,.0f} rows/sec)")
+    if totals['skipped']:
+        print(f"  Skipped {totals['skipped']:,} malformed rows")
+    if totals['duplicates']:
+        print(f"  Found {totals['duplicates']:,} near-duplicates ({args.on_duplicate})")
+
+
+if __name__ == '__main__':
+    main()
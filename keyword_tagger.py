@@ -0,0 +1,239 @@
+"""
+Keyword tagging for scraped prompts
+
+All vocabulary terms (canonical keywords, their synonyms and plurals) are
+compiled into one lookup table. A prompt is split into whole words in a
+single regex pass and intersected with it, so the cost doesn't grow with the
+number of keywords, and "man" no longer matches inside "woman" or "manager".
+Multi-word terms go through one combined word-boundary regex. Matches are
+mapped back to their canonical tag.
+
+Usage:
+    python keyword_tagger.py --benchmark [scraped_images.json]
+"""
+import argparse
+import json
+import re
+import time
+
+# Canonical tag -> extra words that should produce it (plurals are added automatically)
+PEOPLE_VOCABULARY = {
+    'person': ['persons'],
+    'people': [],
+    'man': ['guy'],
+    'woman': [],
+    'child': ['kid'],
+    'boy': [],
+    'girl': [],
+    'human': [],
+    'portrait': ['headshot', 'selfie'],
+    'face': [],
+    'family': [],
+    'group': [],
+    'crowd': [],
+    'individual': [],
+    'someone': ['somebody'],
+    'figure': [],
+    'character': [],
+    'lady': [],
+    'gentleman': [],
+    'adult': [],
+    'teenager': ['teen', 'adolescent'],
+    'elder': ['elderly'],
+    'senior': [],
+    'youth': [],
+    'baby': ['toddler'],
+    'infant': ['newborn'],
+}
+
+IRREGULAR_PLURALS = {
+    'man': 'men',
+    'woman': 'women',
+    'gentleman': 'gentlemen',
+    'child': 'children',
+    'person': 'people',
+}
+
+# Same notion of a word as the regex \b
+WORD_RE = re.compile(r"\w+")
+
+# Words with no useful plural form
+UNCOUNTABLE = {'people', 'someone', 'somebody', 'elderly', 'youth'}
+
+
+def pluralize(word):
+    """Plural of a simple English noun (good enough for a keyword list)"""
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if re.search(r'[^aeiou]y$', word):
+        return word[:-1] + 'ies'
+    if re.search(r'(s|x|z|ch|sh)$', word):
+        return word + 'es'
+    return word + 's'
+
+
+class KeywordTagger:
+    """
+    Tags text with canonical keywords from a vocabulary.
+    
+    `vocabulary` maps each canonical tag to a list of synonyms. With
+    plurals=True the plural of every term is matched too, unless that
+    plural is itself a canonical tag (e.g. "people" stays its own tag
+    rather than becoming "person").
+    """
+    def __init__(self, vocabulary=None, plurals=True):
+        self.plurals = plurals
+        self._terms = {}
+        self._words = frozenset()
+        self._rank = {}
+        self._pattern = None
+        for canonical, synonyms in (vocabulary or PEOPLE_VOCABULARY).items():
+            self.add(canonical, *synonyms)
+    
+    def add(self, canonical, *synonyms):
+        """Extend the vocabulary; takes effect on the next tag() call"""
+        canonical = canonical.lower()
+        for term in (canonical,) + tuple(s.lower() for s in synonyms):
+            self._terms.setdefault(term, canonical)
+            if self.plurals and term not in UNCOUNTABLE:
+                self._terms.setdefault(pluralize(term), canonical)
+        # Canonical tags always map to themselves, even if seen earlier as a plural
+        self._terms[canonical] = canonical
+        self._rank.setdefault(canonical, len(self._rank))
+        self._pattern = None
+    
+    @property
+    def terms(self):
+        """Every matched word mapped to its canonical tag"""
+        return dict(self._terms)
+    
+    def _compiled(self):
+        if self._pattern is None:
+            # Multi-word terms need a regex; single words are a set lookup
+            phrases = sorted((t for t in self._terms if ' ' in t), key=len, reverse=True)
+            body = '|'.join(re.escape(term).replace(r'\ ', r'\s+') for term in phrases)
+            self._pattern = re.compile(r'\b(?:' + body + r')\b') if phrases else False
+            self._words = frozenset(t for t in self._terms if ' ' not in t)
+        return self._pattern
+    
+    def tag(self, text):
+        """Canonical tags found in text, in vocabulary order"""
+        if not text:
+            return []
+        phrases = self._compiled()
+        terms = self._terms
+        text = text.lower()
+        
+        # One pass splits the text into words; the vocabulary is a set intersection
+        found = set(WORD_RE.findall(text))
+        found &= self._words
+        if phrases:
+            found.update(' '.join(match.split()) for match in phrases.findall(text))
+        if not found:
+            return []
+        return sorted({terms[term] for term in found}, key=self._rank.get)
+    
+    def tag_many(self, texts):
+        """Tag a batch of texts, returning one tag list per text"""
+        tag = self.tag
+        self._compiled()
+        return [tag(text) for text in texts]
+
+
+_default_tagger = None
+
+
+def default_tagger():
+    """Shared tagger over PEOPLE_VOCABULARY"""
+    global _default_tagger
+    if _default_tagger is None:
+        _default_tagger = KeywordTagger()
+    return _default_tagger
+
+
+def tag_people(text):
+    """People-related tags in a prompt"""
+    return default_tagger().tag(text)
+
+
+def legacy_tags(text, keywords, word_boundary=False):
+    """The old per-keyword scans (substring, or one \\b regex per keyword), kept for the benchmark"""
+    tags = []
+    text_lower = text.lower()
+    for keyword in keywords:
+        if word_boundary:
+            if re.search(r'\b' + keyword + r'\b', text_lower):
+                tags.append(keyword)
+        elif keyword in text_lower:
+            tags.append(keyword)
+    return list(set(tags))
+
+
+def _time(label, func, batch):
+    start = time.perf_counter()
+    results = [func(text) for text in batch]
+    seconds = time.perf_counter() - start
+    print(f"  {label:<28} {seconds:7.3f}s ({len(batch) / seconds:>9,.0f} prompts/s)")
+    return results, seconds
+
+
+def benchmark(path='scraped_images.json', repeat=200):
+    """Compare the legacy loops with the compiled tagger on the prompts in path"""
+    with open(path, 'r', encoding='utf-8') as f:
+        prompts = [item.get('prompt') or '' for item in json.load(f)]
+    prompts = [p for p in prompts if p]
+    batch = prompts * repeat
+    keywords = list(PEOPLE_VOCABULARY)
+    tagger = default_tagger()
+    
+    print(f"{len(batch)} prompts ({len(prompts)} unique x {repeat}), "
+          f"{len(keywords)} keywords / {len(tagger.terms)} terms")
+    legacy, substring_seconds = _time('legacy substring loop', lambda t: legacy_tags(t, keywords), batch)
+    _, regex_seconds = _time('legacy per-keyword regex', lambda t: legacy_tags(t, keywords, True), batch)
+    
+    start = time.perf_counter()
+    compiled = tagger.tag_many(batch)
+    compiled_seconds = time.perf_counter() - start
+    print(f"  {'compiled tagger (tag_many)':<28} {compiled_seconds:7.3f}s "
+          f"({len(batch) / compiled_seconds:>9,.0f} prompts/s)")
+    print(f"  speedup: {regex_seconds / compiled_seconds:.1f}x vs per-keyword regex, "
+          f"{substring_seconds / compiled_seconds:.1f}x vs substring loop")
+    
+    # The legacy loops grow with the vocabulary; the compiled tagger doesn't
+    large = KeywordTagger()
+    for n in range(500):
+        large.add(f'keyword{n}')
+    large_keywords = keywords + [f'keyword{n}' for n in range(500)]
+    sample = prompts * max(1, repeat // 10)
+    print(f"\nWith {len(large_keywords)} keywords ({len(sample)} prompts):")
+    _, large_substring = _time('legacy substring loop', lambda t: legacy_tags(t, large_keywords), sample)
+    _, large_compiled = _time('compiled tagger', large.tag, sample)
+    print(f"  speedup: {large_substring / large_compiled:.1f}x vs substring loop")
+    
+    # Differences from the substring loop: false positives, plurals, synonyms
+    changed = [(text, old, new) for text, old, new in zip(prompts, legacy, compiled)
+               if set(old) != set(new)]
+    print(f"\n{len(changed)} of {len(prompts)} prompts tagged differently than the substring loop:")
+    for text, old, new in changed:
+        print(f"  {text[:60]!r}: {sorted(old)} -> {sorted(new)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tag prompts with people-related keywords')
+    parser.add_argument('text', nargs='*', help='Text to tag')
+    parser.add_argument('--benchmark', nargs='?', const='scraped_images.json', metavar='JSON',
+                        help='Benchmark against the legacy loop (default: scraped_images.json)')
+    parser.add_argument('--repeat', type=int, default=200,
+                        help='Times to repeat the prompts in the benchmark (default: 200)')
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        benchmark(args.benchmark, args.repeat)
+    elif args.text:
+        print(tag_people(' '.join(args.text)))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Database maintenance commands for AI Image Bias Tagger
+
+Usage:
+    python maintenance.py migrate --seed  # create tables, apply migrations, load seed data if empty
+    python maintenance.py migrate --dry-run  # estimate how long pending migrations will take
+    python maintenance.py reconcile     # rebuild view/tag counters from raw rows
+    python maintenance.py checkpoint    # fold the WAL back into the database file
+    python maintenance.py optimize      # refresh query planner statistics
+"""
+import argparse
+import os
+from database import Database
+import migrations
+
+
+def seed_database(db, path='scraped_images.json'):
+    """Load scraped images (or mock data) into an empty database"""
+    from import_images import import_file
+    from scraper import get_mock_data
+    
+    stats = db.get_statistics(fresh=True)
+    if stats['total_images'] > 0:
+        return 0
+    print("Database is empty. Attempting to load scraped images...")
+    
+    # Try to load scraped images first
+    try:
+        if os.path.exists(path):
+            print("Loading scraped images...")
+            totals = import_file(path, db, quiet=True)
+            if totals['rows'] == 0:
+                raise ValueError("Scraped images file is empty")
+            print(f"✓ Loaded {totals['added']} scraped images successfully!")
+            return totals['added']
+        raise FileNotFoundError("No scraped images found")
+    except Exception as e:
+        print(f"Could not load scraped images: {e}")
+        print("Loading mock data instead...")
+        return db.add_images(get_mock_data())
+
+
+def run_migrations(db, args):
+    """The `migrate` command: status, dry run, or apply pending migrations"""
+    if args.dry_run:
+        results = migrations.dry_run(db.db_path, args.sample_batches, args.batch_size, args.pause)
+        if not results:
+            print("✓ No pending migrations")
+        for r in results:
+            print(f"  {r['version']:>3}  {r['description']:<50} {r['batches']:>6} batches  "
+                  f"~{r['estimated_seconds']:.1f}s (measured {r['seconds']:.2f}s)")
+        return
+    
+    conn = db.get_connection()
+    try:
+        if args.status:
+            for version, description, state in migrations.status(conn):
+                print(f"  {version:>3}  {description:<50} {state}")
+            return
+        
+        db.init_database(migrate=False)
+        
+        def progress(migration, batches):
+            if batches % 20 == 0:
+                print(f"  migration {migration.version}: {batches} batches done")
+        
+        for version, description in migrations.migrate(conn, args.target, args.batch_size,
+                                                       args.pause, progress):
+            print(f"Applied migration {version}: {description}")
+        version = migrations.current_version(conn)
+    finally:
+        conn.close()
+    
+    if args.seed:
+        seed_database(db)
+    print(f"✓ Database is up to date (schema version {version})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Image Bias Tagger database maintenance")
+    parser.add_argument('--db', default='data/bias_tagger.db', help="Path to the SQLite database")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    migrate = subparsers.add_parser('migrate', help="Create or upgrade the schema (run once per deploy)")
+    migrate.add_argument('--seed', action='store_true', help="Load seed images if the database is empty")
+    migrate.add_argument('--status', action='store_true', help="List migrations and whether they're applied")
+    migrate.add_argument('--dry-run', action='store_true',
+                         help="Time pending migrations on a copy of the database and estimate their duration")
+    migrate.add_argument('--sample-batches', type=int, default=5,
+                         help="Batches to time per batched migration in a dry run (default: 5)")
+    migrate.add_argument('--target', type=int, help="Stop after this schema version")
+    migrate.add_argument('--batch-size', type=int, help="Rows per batch for batched migrations")
+    migrate.add_argument('--pause', type=float, default=migrations.BATCH_PAUSE,
+                         help=f"Seconds to wait between batches, to leave the app room to write "
+                              f"(default: {migrations.BATCH_PAUSE})")
+    subparsers.add_parser('reconcile', help="Rebuild unique_viewers and bias_tag_count")
+    checkpoint = subparsers.add_parser('checkpoint', help="Checkpoint the write-ahead log")
+    checkpoint.add_argument('--mode', default='TRUNCATE',
+                            choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'])
+    subparsers.add_parser('optimize', help="Run PRAGMA optimize")
+    expire = subparsers.add_parser('expire-sessions',
+                                   help="Delete idle sessions and archive their views")
+    expire.add_argument('--ttl-days', type=float,
+                        help="Idle days before a session expires (default: SESSION_TTL_DAYS or 30)")
+    expire.add_argument('--batch-size', type=int,
+                        help="Sessions per batch (default: SESSION_CLEANUP_BATCH or 500)")
+    vacuum = subparsers.add_parser('vacuum', help="Return free pages to the filesystem")
+    vacuum.add_argument('--pages', type=int, help="Pages to free (default: VACUUM_PAGES or 1000)")
+    vacuum.add_argument('--full', action='store_true',
+                        help="Rebuild the whole file instead; blocks writers while it runs, and is "
+                             "needed once to turn on incremental vacuum for an existing database")
+    
+    args = parser.parse_args()
+    if args.command == 'migrate' and (args.status or args.dry_run) and not os.path.exists(args.db):
+        # Inspecting a database must not create an empty one
+        parser.error(f"database {args.db} does not exist")
+    # `migrate` sets up the schema itself, with its own options
+    db = Database(args.db, initialize=args.command != 'migrate')
+    
+    try:
+        if args.command == 'migrate':
+            run_migrations(db, args)
+        elif args.command == 'reconcile':
+            db.reconcile_counters()
+        elif args.command == 'checkpoint':
+            result = db.checkpoint(args.mode)
+            print(f"✓ Checkpointed {result['checkpointed']} of {result['log_frames']} WAL frames")
+        elif args.command == 'optimize':
+            db.optimize()
+            print("✓ PRAGMA optimize complete")
+        elif args.command == 'expire-sessions':
+            result = db.expire_sessions(args.ttl_days, args.batch_size)
+            print(f"✓ Expired {result['sessions']} sessions ({result['views']} view rows archived)")
+        elif args.command == 'vacuum':
+            if args.full:
+                db.vacuum()
+                print("✓ VACUUM complete")
+            else:
+                print(f"✓ Freed {db.incremental_vacuum(args.pages)} pages")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
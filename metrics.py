@@ -0,0 +1,226 @@
+"""
+Request and SQL timing, exposed in Prometheus text format
+
+init_app() adds before/after-request hooks that record a latency histogram
+per route, method and status. Database connections are opened with
+InstrumentedConnection, whose cursors time every statement under its
+normalized text (whitespace collapsed, literals and IN lists folded to ?) and
+count the rows it touched. Everything is served at /metrics.
+
+Set SLOW_QUERY_MS to log statements slower than that. METRICS_ENABLED=0
+turns the SQL instrumentation off entirely.
+
+Metrics live in the process that recorded them; with several gunicorn or
+uvicorn workers each one reports its own numbers.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 0) or 0)
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value, *labels):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts plus one overflow slot, then sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            base = _labels(self.labels, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{base}le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{base.rstrip(",")}}} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{{base.rstrip(",")}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values"""
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount, *labels):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            snapshot = dict(self._series)
+        for labels, value in sorted(snapshot.items()):
+            lines.append(f'{self.name}{{{_labels(self.labels, labels).rstrip(",")}}} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values):
+    return ''.join(f'{name}="{_escape(value)}",' for name, value in zip(names, values))
+
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by route',
+                            ('route', 'method', 'status'), REQUEST_BUCKETS)
+QUERY_LATENCY = Histogram('db_query_duration_seconds', 'SQL statement execution time by normalized statement',
+                          ('statement',), QUERY_BUCKETS)
+QUERY_ROWS = Counter('db_query_rows_total', 'Rows fetched or changed by normalized statement', ('statement',))
+SLOW_QUERIES = Counter('db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS', ('statement',))
+
+
+def render(gauges=None):
+    """All metrics in Prometheus text format, plus {(name, help): value} gauges read at scrape time"""
+    lines = []
+    for metric in (REQUEST_LATENCY, QUERY_LATENCY, QUERY_ROWS, SLOW_QUERIES):
+        lines.extend(metric.render())
+    for (name, help), value in (gauges or {}).items():
+        lines.extend([f'# HELP {name} {help}', f'# TYPE {name} gauge', f'{name} {value}'])
+    return '\n'.join(lines) + '\n'
+
+
+def observe_request(route, method, status, seconds):
+    REQUEST_LATENCY.observe(seconds, route, method, str(status))
+
+
+def init_app(app):
+    """Time every request to the app"""
+    from flask import g, request
+    
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+    
+    @app.after_request
+    def record_request(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            # Label by route pattern; unmatched URLs share one label so scanners
+            # can't blow up the series count
+            rule = request.url_rule.rule if request.url_rule else 'unmatched'
+            observe_request(rule, request.method, response.status_code, time.perf_counter() - start)
+        return response
+
+
+_normalized = {}
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+
+
+def normalize_sql(sql):
+    """Statement text with literals and IN lists folded, so variants share a series"""
+    text = _normalized.get(sql)
+    if text is None:
+        text = _WHITESPACE.sub(' ', sql).strip()
+        text = _STRING.sub('?', text)
+        text = _NUMBER.sub('?', text)
+        text = _LIST.sub('?, ...', text)
+        # Statements are built from a handful of templates; cap the cache anyway
+        if len(_normalized) < 2000:
+            _normalized[sql] = text
+    return text
+
+
+def _record(statement, seconds, rows):
+    QUERY_LATENCY.observe(seconds, statement)
+    if rows > 0:
+        QUERY_ROWS.inc(rows, statement)
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(1, statement)
+        print(f"Slow query ({seconds * 1000:.1f} ms): {statement}")
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that times execute()/executemany() and counts rows.
+    
+    Changed rows come from rowcount; fetched rows are counted in fetchone(),
+    fetchmany() and fetchall() and credited to the last statement.
+    """
+    _statement = None
+    
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._statement = normalize_sql(sql)
+            _record(self._statement, time.perf_counter() - start, self.rowcount)
+    
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._statement = normalize_sql(sql)
+            _record(self._statement, time.perf_counter() - start, self.rowcount)
+    
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None and self._statement:
+            QUERY_ROWS.inc(1, self._statement)
+        return row
+    
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if rows and self._statement:
+            QUERY_ROWS.inc(len(rows), self._statement)
+        return rows
+    
+    def fetchall(self):
+        rows = super().fetchall()
+        if rows and self._statement:
+            QUERY_ROWS.inc(len(rows), self._statement)
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors (including conn.execute()) are InstrumentedCursors"""
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory():
+    """Connection class for sqlite3.connect(factory=...)"""
+    return InstrumentedConnection if ENABLED else sqlite3.Connection
@@ -0,0 +1,355 @@
+"""
+Versioned schema migrations
+
+init_database() creates the base tables; everything added after that is a
+numbered migration here. The schema_version table records which ones have
+been applied, so `python maintenance.py migrate` only runs the new ones.
+
+A plain migration runs in one write transaction. A batched migration (one
+registered with batch_size) processes a table a chunk at a time, committing
+after every chunk, so a backfill over a large table like image_views never
+holds the write lock for long and the app keeps serving while it runs. Its
+position is saved in schema_migration_progress, so an interrupted run picks up
+where it stopped. Every transaction re-checks the version, so two processes
+migrating at once can't apply a step twice.
+
+dry_run() runs the pending migrations on a copy of the database (batched
+ones for a few sample chunks) and estimates how long each will take.
+
+To change the schema, append a function decorated with
+@migration(<next version>, "<what it does>"); never edit one that has shipped.
+"""
+import json
+import math
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+
+class Migration:
+    """
+    One schema step.
+    
+    Plain: func(conn) makes the change. Batched: func(conn, after, limit)
+    handles the chunk following key `after` (None on the first call) and
+    returns the key to continue from, or None when done; count(conn) is the
+    number of rows it has to visit, for progress and estimates.
+    """
+    def __init__(self, version, description, func, batch_size=None, count=None):
+        self.version = version
+        self.description = description
+        self.func = func
+        self.batch_size = batch_size
+        self.count = count
+    
+    @property
+    def batched(self):
+        return self.batch_size is not None
+
+
+MIGRATIONS = []
+
+
+def migration(version, description, batch_size=None, count=None):
+    """Register a schema migration; versions must be applied in increasing order"""
+    def register(func):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise ValueError(f"Migration {version} is out of order")
+        MIGRATIONS.append(Migration(version, description, func, batch_size, count))
+        return func
+    return register
+
+
+@migration(1, "image_tags table; phash and payload columns on images")
+def add_tag_table_and_image_columns(conn):
+    # Normalized image tags, so images can be filtered by tag through an index.
+    # Databases from before versioning may already have all of this
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS image_tags (
+            tag TEXT NOT NULL,
+            image_id TEXT NOT NULL,
+            PRIMARY KEY (tag, image_id),
+            FOREIGN KEY (image_id) REFERENCES images(id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_image_tags_image ON image_tags(image_id)')
+    
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(images)')}
+    if 'phash' not in columns:
+        # Perceptual hash for near-duplicate detection on import
+        conn.execute('ALTER TABLE images ADD COLUMN phash TEXT')
+    if 'payload' not in columns:
+        # Ready-to-send JSON for the tagging UI; filled in for existing rows by migration 3
+        conn.execute('ALTER TABLE images ADD COLUMN payload TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_images_phash ON images(phash)')
+
+
+@migration(2, "Composite and partial indexes for the hot queries")
+def add_hot_query_indexes(conn):
+    # Views by session (session cleanup, per-session lookups); replaces the
+    # single-column index, which is a prefix of this one
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_image_views_session_image ON image_views(user_session, image_id)')
+    conn.execute('DROP INDEX IF EXISTS idx_image_views_session')
+    
+    # Dashboard: most recent tags, and the breakdown by bias type
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_bias_tags_created ON bias_tags(created_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_bias_tags_type ON bias_tags(bias_type)')
+    
+    # Only tagged images are ever looked up by bias_tag_count, and they are few
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_images_tagged ON images(bias_tag_count) WHERE bias_tag_count > 0')
+
+
+def _images_rowid_span(conn):
+    return conn.execute('SELECT COALESCE(MAX(rowid), 0) FROM images').fetchone()[0]
+
+
+@migration(3, "Backfill images.payload and image_tags", batch_size=5000, count=_images_rowid_span)
+def backfill_payloads(conn, after, limit):
+    # Rows without a payload are served fine (it's built on the fly), so this
+    # can run while the app is up
+    from database import Database
+    
+    start = after or 0
+    if start >= _images_rowid_span(conn):
+        return None
+    rows = conn.execute('''
+        SELECT id, url, prompt, tags, source FROM images
+        WHERE rowid > ? AND rowid <= ? AND payload IS NULL
+    ''', (start, start + limit)).fetchall()
+    
+    payloads = []
+    image_tags = []
+    for image_id, url, prompt, tags_json, source in rows:
+        image = {'id': image_id, 'url': url, 'prompt': prompt, 'tags': tags_json, 'source': source}
+        payloads.append((Database.image_payload(image), image_id))
+        try:
+            tags = Database._tag_list(json.loads(tags_json)) if tags_json else []
+        except (ValueError, TypeError):
+            tags = []
+        image_tags.extend((image_id, tag) for tag in tags)
+    conn.executemany('UPDATE images SET payload = ? WHERE id = ?', payloads)
+    conn.executemany('INSERT OR IGNORE INTO image_tags (image_id, tag) VALUES (?, ?)', image_tags)
+    return start + limit
+
+
+@migration(4, "View archive for expired sessions; index sessions by last activity")
+def add_view_archive(conn):
+    # Views of expired sessions are folded into one row per image, so
+    # image_views only keeps rows someone can still be shown images against
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS image_view_archive (
+            image_id TEXT PRIMARY KEY,
+            viewers INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (image_id) REFERENCES images(id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_sessions_last_active ON user_sessions(last_active)')
+
+
+def ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Where an unfinished batched migration got to
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migration_progress (
+            version INTEGER PRIMARY KEY,
+            last_key,
+            batches INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def _table_exists(conn, name):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+    return row is not None
+
+
+def current_version(conn):
+    """Highest applied migration (0 for a database that has none)"""
+    if not _table_exists(conn, 'schema_version'):
+        return 0
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def pending(conn):
+    """Migrations not yet applied, in order (read-only)"""
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def status(conn):
+    """(version, description, state) for every known migration (read-only)"""
+    version = current_version(conn)
+    progress = {}
+    if _table_exists(conn, 'schema_migration_progress'):
+        progress = {row[0]: row[1] for row in conn.execute(
+            'SELECT version, batches FROM schema_migration_progress')}
+    states = []
+    for m in MIGRATIONS:
+        if m.version <= version:
+            state = 'applied'
+        elif m.version in progress:
+            state = f'in progress ({progress[m.version]} batches done)'
+        else:
+            state = 'pending'
+        states.append((m.version, m.description, state))
+    return states
+
+
+def _finish(conn, m):
+    conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)', (m.version, m.description))
+    conn.execute('DELETE FROM schema_migration_progress WHERE version = ?', (m.version,))
+
+
+def _apply_plain(conn, m):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Another process may have applied it while we waited for the lock
+        if current_version(conn) >= m.version:
+            conn.rollback()
+            return False
+        m.func(conn)
+        _finish(conn, m)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def _apply_batch(conn, m, batch_size):
+    """Run one chunk of a batched migration in its own transaction; True once it's complete"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if current_version(conn) >= m.version:
+            conn.rollback()
+            return True
+        row = conn.execute('SELECT last_key FROM schema_migration_progress WHERE version = ?',
+                           (m.version,)).fetchone()
+        next_key = m.func(conn, row[0] if row else None, batch_size)
+        if next_key is None:
+            _finish(conn, m)
+        else:
+            conn.execute('''
+                INSERT INTO schema_migration_progress (version, last_key, batches) VALUES (?, ?, 1)
+                ON CONFLICT(version) DO UPDATE SET
+                    last_key = excluded.last_key,
+                    batches = batches + 1,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (m.version, next_key))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return next_key is None
+
+
+# Pause between batches. SQLite's busy handler backs off while it waits, so
+# without a gap a writer from the app can miss every window between batches
+BATCH_PAUSE = 0.05
+
+
+def migrate(conn, target=None, batch_size=None, pause=BATCH_PAUSE, progress=None):
+    """
+    Apply pending migrations up to `target` (default: all).
+    
+    batch_size overrides each batched migration's own; `pause` seconds are
+    slept between chunks to give live writers the lock. Returns the
+    (version, description) pairs applied.
+    """
+    ensure_version_table(conn)
+    applied = []
+    for m in pending(conn):
+        if target is not None and m.version > target:
+            break
+        if not m.batched:
+            if _apply_plain(conn, m):
+                applied.append((m.version, m.description))
+            continue
+        
+        batches = 0
+        while not _apply_batch(conn, m, batch_size or m.batch_size):
+            batches += 1
+            if progress:
+                progress(m, batches)
+            if pause:
+                time.sleep(pause)
+        applied.append((m.version, m.description))
+    return applied
+
+
+def copy_database(path):
+    """Consistent copy of a (possibly live) database in a temp dir"""
+    directory = tempfile.mkdtemp(prefix='migrate-dry-run-')
+    copy = os.path.join(directory, os.path.basename(path))
+    source = sqlite3.connect(path)
+    target = sqlite3.connect(copy)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    return copy
+
+
+def dry_run(path, sample_batches=5, batch_size=None, pause=BATCH_PAUSE):
+    """
+    Time the pending migrations on a copy of the database at `path`.
+    
+    Plain migrations are run in full; batched ones for `sample_batches`
+    chunks, extrapolated to their row count, plus the `pause` migrate()
+    sleeps between chunks. Returns one dict per migration with 'seconds'
+    (measured) and 'estimated_seconds'.
+    """
+    from database import Database
+    
+    copy = copy_database(path)
+    db = Database(copy, pool_size=1, initialize=False)
+    results = []
+    try:
+        db.init_database(migrate=False)
+        conn = db.get_connection()
+        try:
+            ensure_version_table(conn)
+            for m in pending(conn):
+                start = time.perf_counter()
+                if not m.batched:
+                    _apply_plain(conn, m)
+                    seconds = time.perf_counter() - start
+                    results.append({'version': m.version, 'description': m.description,
+                                    'batches': 1, 'seconds': seconds, 'estimated_seconds': seconds})
+                    continue
+                
+                size = batch_size or m.batch_size
+                total_batches = max(1, math.ceil(m.count(conn) / size)) if m.count else None
+                done = 0
+                finished = False
+                while done < sample_batches and not finished:
+                    finished = _apply_batch(conn, m, size)
+                    done += 1
+                seconds = time.perf_counter() - start
+                if finished or not total_batches:
+                    estimate = seconds
+                    total_batches = done
+                else:
+                    estimate = seconds / done * total_batches
+                estimate += (pause or 0) * (total_batches - 1)
+                results.append({'version': m.version, 'description': m.description,
+                                'batches': total_batches, 'seconds': seconds,
+                                'estimated_seconds': estimate})
+        finally:
+            conn.close()
+    finally:
+        db.close()
+        shutil.rmtree(os.path.dirname(copy), ignore_errors=True)
+    return results
@@ -0,0 +1,189 @@
+"""
+Query plan checks for the hot Database methods
+
+Runs each method the tagging API depends on against a scratch copy of a
+database, captures the SQL it actually executes, and prints the
+EXPLAIN QUERY PLAN for each statement. Exits non-zero if any statement reads
+a whole table (a SCAN that isn't index-only), so a missing index or a query
+rewrite that defeats one is caught before it ships.
+
+On a generated database it also checks that new files get incremental
+auto-vacuum and that expiring sessions frees pages incremental_vacuum() can
+hand back.
+
+Usage:
+    python query_plans.py                        # on a generated 5k-row database
+    python query_plans.py --db data/bias_tagger.db
+    python query_plans.py --verbose              # print every plan, not just failures
+"""
+import argparse
+import contextlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+from database import Database
+from metrics import normalize_sql
+
+# Statements allowed to read the whole table, and why
+ALLOWED_SCANS = {
+    'SELECT SUM(view_count) as count FROM images':
+        "whole-table total for the dashboard; served from StatisticsCache",
+    'SELECT image_id FROM bias_tags ORDER BY created_at DESC, id DESC':
+        "walks idx_bias_tags_created newest first and stops after 10 images",
+    'SELECT t.tag, COUNT(*) AS count FROM image_tags t JOIN images i ON i.id = t.image_id WHERE i.status = ? GROUP BY t.tag ORDER BY count DESC':
+        "counts every tag of every active image; not on the tagging path",
+}
+
+# Statements that don't touch table data
+SKIP = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|PRAGMA)\b', re.IGNORECASE)
+
+# "SCAN images" and "SCAN i USING INDEX ..." visit every row; "SCAN t USING
+# COVERING INDEX ..." (index only) and "SCAN CONSTANT ROW" don't
+SCAN = re.compile(r'^SCAN (\w+)(.*)$')
+
+
+def hot_calls(db, session_id, image_id):
+    """(name, call) for the Database methods on the request path"""
+    return [
+        ('create_or_get_session', lambda: db.create_or_get_session('plan_check_session')),
+        ('get_random_unviewed_image', lambda: db.get_random_unviewed_image(session_id)),
+        ('get_random_unviewed_images', lambda: db.get_random_unviewed_images(session_id, 5, [image_id])),
+        ('record_views', lambda: db.record_views([(image_id, 'plan_check_session')])),
+        ('add_bias_tags', lambda: db.add_bias_tags(image_id, 'plan_check_session', ['age', 'gender'])),
+        ('get_statistics', lambda: db.get_statistics(fresh=True)),
+        ('get_image_details', lambda: db.get_image_details(image_id)),
+        ('get_images_by_tag', lambda: db.get_images_by_tag('man')),
+        ('get_tag_counts', lambda: db.get_tag_counts()),
+    ]
+
+
+def capture(db, call):
+    """SQL statements (with bound values) that call() runs"""
+    statements = []
+    # One pooled connection, reused by this thread, so the trace sees every statement
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    conn.close()
+    try:
+        call()
+    finally:
+        conn = db.get_connection()
+        conn.set_trace_callback(None)
+        conn.close()
+    return [s for s in statements if not SKIP.match(s)]
+
+
+def explain(db, sql):
+    conn = db.get_connection()
+    try:
+        return [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+    finally:
+        conn.close()
+
+
+def full_scans(plan):
+    """Tables the plan reads in full"""
+    tables = []
+    for detail in plan:
+        match = SCAN.match(detail)
+        if match and match.group(1) != 'CONSTANT' and 'COVERING INDEX' not in match.group(2):
+            tables.append(match.group(1))
+    return tables
+
+
+def check(db, verbose=False):
+    """Explain every hot statement; returns the number of unexpected full scans"""
+    conn = db.get_connection()
+    try:
+        session_row = conn.execute('SELECT session_id FROM user_sessions LIMIT 1').fetchone()
+        image_row = conn.execute("SELECT id FROM images WHERE status = 'active' LIMIT 1").fetchone()
+    finally:
+        conn.close()
+    if not session_row or not image_row:
+        raise SystemExit("The database needs at least one session and one active image")
+    
+    failures = 0
+    seen = set()
+    for name, call in hot_calls(db, session_row[0], image_row[0]):
+        for sql in capture(db, call):
+            statement = normalize_sql(sql)
+            if statement in seen:
+                continue
+            seen.add(statement)
+            
+            plan = explain(db, sql)
+            scans = full_scans(plan)
+            allowed = ALLOWED_SCANS.get(statement)
+            if scans and not allowed:
+                failures += 1
+                status = f"FULL SCAN of {', '.join(scans)}"
+            elif scans:
+                status = f"allowed scan ({allowed})"
+            else:
+                status = "ok"
+            
+            if verbose or (scans and not allowed):
+                print(f"\n[{name}] {status}\n  {statement[:200]}")
+                for detail in plan:
+                    print(f"    {detail}")
+    print(f"\n{len(seen)} statements checked, {failures} unexpected full table scans")
+    return failures
+
+
+def check_vacuum(db):
+    """Expire half the sessions of a new database; returns 1 if no pages come back, else 0"""
+    conn = db.get_connection()
+    try:
+        mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        if mode != 2:
+            print(f"\nauto_vacuum is {mode} on a new database, expected 2 (INCREMENTAL)")
+            return 1
+        conn.execute("UPDATE user_sessions SET last_active = datetime('now', '-365 days') WHERE rowid % 2 = 0")
+        conn.commit()
+    finally:
+        conn.close()
+    
+    expired = db.expire_sessions(ttl_days=1, pause=0)
+    freed = db.incremental_vacuum()
+    print(f"\nExpired {expired['sessions']} sessions ({expired['views']} views), "
+          f"incremental vacuum freed {freed} pages")
+    if expired['views'] and not freed:
+        print("Expiring sessions left no pages for incremental_vacuum() to free")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a hot query falls back to a full table scan")
+    parser.add_argument('--db', help="Database to check a copy of (default: a generated one)")
+    parser.add_argument('--rows', default='5k', help="Rows to generate when --db isn't given (default: 5k)")
+    parser.add_argument('--verbose', action='store_true', help="Print every query plan")
+    args = parser.parse_args()
+    
+    import benchmark
+    
+    with contextlib.ExitStack() as cleanup:
+        if args.db:
+            path = cleanup.enter_context(benchmark.working_copy(args.db))
+        else:
+            directory = tempfile.mkdtemp(prefix='query-plans-')
+            cleanup.callback(shutil.rmtree, directory, ignore_errors=True)
+            path = os.path.join(directory, 'plans.db')
+            benchmark.generate(path, benchmark.parse_rows(args.rows))
+        
+        # Bring the copy up to the current schema, then check it
+        db = Database(path, pool_size=1)
+        try:
+            failures = check(db, args.verbose)
+            if not args.db:
+                failures += check_vacuum(db)
+        finally:
+            db.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Parallel scheduling for scraper detail pages
+
+A fixed number of worker threads each own one browser session (or HTTP
+session), pull URLs from a shared queue and respect a shared rate limit, so
+N workers are never more aggressive towards the site than the limiter
+allows. Results are merged back in the original URL order.
+"""
+import queue
+import threading
+import time
+
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart across all threads"""
+    def __init__(self, rate_per_sec):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        """Block until this caller's slot comes up"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def run_in_parallel(items, process, make_worker, close_worker=None, workers=4, limiter=None):
+    """
+    Run process(worker, item) over items on `workers` threads.
+    
+    make_worker() is called once per thread (e.g. to start a browser) and
+    close_worker(worker) when that thread finishes. Returns a list of
+    results in the same order as items; an item whose processing raised
+    gets None.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    pending = queue.Queue()
+    for index, item in enumerate(items):
+        pending.put((index, item))
+    
+    def run():
+        worker = None
+        try:
+            while True:
+                try:
+                    index, item = pending.get_nowait()
+                except queue.Empty:
+                    return
+                if worker is None:
+                    worker = make_worker()
+                if limiter:
+                    limiter.wait()
+                try:
+                    results[index] = process(worker, item)
+                except Exception as e:
+                    print(f"  ✗ Error processing {item}: {e}")
+        except Exception as e:
+            # Typically the browser failed to start; other threads carry on
+            print(f"  ✗ Worker stopped: {e}")
+        finally:
+            if worker is not None and close_worker:
+                close_worker(worker)
+    
+    threads = [threading.Thread(target=run, name=f'scrape-worker-{n}', daemon=True)
+               for n in range(max(1, min(workers, len(items))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    return results
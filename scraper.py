@@ -11,6 +11,7 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 import time
 import json
+from keyword_tagger import tag_people
 
 
 class SoraScraper:
@@ -120,21 +121,8 @@ class SoraScraper:
     
     def _extract_tags_from_text(self, text):
         """Extract relevant tags from prompt text"""
-        tags = []
-        
-        # Keywords that might indicate people in images
-        people_keywords = [
-            'person', 'people', 'man', 'woman', 'child', 'boy', 'girl',
-            'human', 'portrait', 'face', 'family', 'group', 'crowd',
-            'individual', 'someone', 'figure', 'character'
-        ]
-        
-        text_lower = text.lower()
-        for keyword in people_keywords:
-            if keyword in text_lower:
-                tags.append(keyword)
-        
-        return list(set(tags))  # Remove duplicates
+        # Whole-word matches against the shared people vocabulary (synonyms and plurals included)
+        return tag_people(text)
     
     def filter_images_with_people(self):
         """Filter images that likely contain people"""
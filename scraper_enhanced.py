@@ -8,66 +8,52 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
+import argparse
 import time
 import json
 import re
 import os
-from urllib.parse import urlparse
+import threading
 from database import Database
+from downloader import MediaDownloader
+import crawl_state
+from keyword_tagger import tag_people
+from scrape_pool import RateLimiter, run_in_parallel
 
 
 class SoraScraperEnhanced:
-    def __init__(self):
+    def __init__(self, state=None):
         self.base_url = "https://sora.chatgpt.com/explore/top"
         self.images = []
         self.driver = None
         self.visited_urls = set()
         self.images_dir = "images"
         
+        # Optional crawl_state.CrawlState recording per-URL progress
+        self.state = state
+        
         # Create images directory if it doesn't exist
         if not os.path.exists(self.images_dir):
             os.makedirs(self.images_dir)
             print(f"Created directory: {self.images_dir}")
+        
+        # Shared keep-alive session and worker pool for media downloads
+        self.downloader = MediaDownloader(self.images_dir)
     
     def download_media(self, url, image_id):
         """Download image or video from URL and save locally"""
-        try:
-            # Determine file extension
-            parsed = urlparse(url)
-            ext = os.path.splitext(parsed.path)[1]
-            if not ext or ext not in ['.jpg', '.jpeg', '.png', '.gif', '.mp4', '.webm', '.mov']:
-                ext = '.jpg'  # default
-            
-            filename = f"{image_id}{ext}"
-            filepath = os.path.join(self.images_dir, filename)
-            
-            # Check if already downloaded
-            if os.path.exists(filepath):
-                print(f"  Already downloaded: {filename}")
-                return filepath
-            
-            # Download the file
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(url, headers=headers, timeout=30, stream=True)
-            response.raise_for_status()
-            
-            # Save to file
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            print(f"  ✓ Downloaded: {filename}")
-            return filepath
-            
-        except Exception as e:
-            print(f"  ✗ Download failed: {e}")
-            return None
-        
+        return self.downloader.download(url, image_id)
+    
+    def download_all_media(self, items):
+        """Download many (url, image_id) pairs concurrently"""
+        results = self.downloader.download_all(items)
+        self.downloader.report()
+        return results
+    
     def setup_driver(self):
         """Set up Selenium WebDriver with Chrome"""
         chrome_options = Options()
@@ -89,13 +75,22 @@ class SoraScraperEnhanced:
             print("Trying without service (assuming ChromeDriver in PATH)...")
             return webdriver.Chrome(options=chrome_options)
     
-    def scrape_images(self, max_images=50, scroll_wait=3):
+    def scrape_images(self, max_images=50, scroll_wait=3, workers=3, rate=1.0, fetch_mode='browser',
+                      resume=False):
         """
         Scrape images from Sora explore/top page
         This collects links to individual image pages, then scrapes each one for details
+        using `workers` parallel sessions sharing a limit of `rate` page loads per second.
+        With resume=True (and a crawl-state store) finished pages from earlier runs are
+        reused and only unfinished ones are scraped; otherwise the store is cleared
+        and the crawl starts from scratch.
         """
         print(f"Starting scraper for {self.base_url}...")
         
+        if self.state is not None and not resume:
+            # Earlier progress would hide pages this run has to return
+            self.state.reset()
+        
         try:
             self.driver = self.setup_driver()
             print("Opening Sora top images page...")
@@ -103,7 +98,7 @@ class SoraScraperEnhanced:
             
             # Wait for initial page load
             print("Waiting for page to load...")
-            time.sleep(5)
+            self._wait_for_page()
             
             # Check if login is required
             current_url = self.driver.current_url.lower()
@@ -121,11 +116,11 @@ class SoraScraperEnhanced:
                     input()
                 except EOFError:
                     print("\nNo input received, checking if page is ready...")
-                    time.sleep(2)
+                    self._wait_for_page(EC.url_contains('explore'))
             
             # Verify we're on the right page
             print("\nVerifying page loaded correctly...")
-            time.sleep(2)
+            self._wait_for_page()
             final_url = self.driver.current_url
             print(f"Current URL: {final_url}")
             
@@ -133,31 +128,42 @@ class SoraScraperEnhanced:
                 print("\n⚠️  Warning: Not on explore page!")
                 print("Attempting to navigate to explore/top...")
                 self.driver.get(self.base_url)
-                time.sleep(5)
+                self._wait_for_page(self.GALLERY_LOADED)
             
             # Step 1: Collect image detail page URLs from gallery
-            print(f"\nCollecting image links from gallery...")
-            image_links = self._collect_image_links(max_images, scroll_wait)
-            print(f"Found {len(image_links)} image links to scrape")
+            image_links = []
+            if resume and self.state is not None:
+                self.images = self.state.completed_records()
+                image_links = self.state.pending_urls(limit=max(0, max_images - len(self.images)))
+                print(f"\nResuming: {len(self.images)} images already scraped, "
+                      f"{len(image_links)} queued from the last run")
+            
+            wanted = max_images - len(self.images)
+            if len(image_links) < wanted:
+                print(f"\nCollecting image links from gallery...")
+                gallery_links = self._collect_image_links(max_images, scroll_wait)
+                print(f"Found {len(gallery_links)} image links")
+                if self.state is not None:
+                    self.state.enqueue(gallery_links)
+                    image_links = self.state.pending_urls(limit=max(0, wanted))
+                else:
+                    image_links = gallery_links[:wanted]
+            print(f"{len(image_links)} image pages to scrape")
             
             # Step 2: Visit each image page and extract detailed metadata
             print(f"\nScraping detailed metadata from each image...")
-            for idx, link in enumerate(image_links[:max_images], 1):
-                print(f"[{idx}/{min(len(image_links), max_images)}] Scraping: {link}")
-                try:
-                    image_data = self._scrape_image_details(link)
-                    if image_data:
-                        self.images.append(image_data)
-                        prompt = image_data.get('prompt', 'No prompt')
-                        if prompt:
-                            print(f"  ✓ Got: {prompt[:60]}...")
-                        else:
-                            print(f"  ✓ Got image but no prompt")
-                    else:
-                        print(f"  ✗ Failed to extract data")
-                except Exception as e:
-                    print(f"  ✗ Error: {str(e)}")
-                time.sleep(2)  # Be polite, don't hammer the server
+            results = self.scrape_details(image_links, workers, rate, fetch_mode)
+            
+            scraped = []
+            for link, image_data in zip(image_links, results):
+                if image_data:
+                    scraped.append((link, image_data))
+                    self.images.append(image_data)
+                else:
+                    print(f"  ✗ Failed to extract data: {link}")
+            
+            # Step 3: Download the media found on those pages in one pooled batch
+            self._download_scraped_media(scraped)
             
             print(f"\n✓ Successfully scraped {len(self.images)} images with full metadata")
             
@@ -168,7 +174,7 @@ class SoraScraperEnhanced:
                 print("  2. The CSS selectors need to be updated")
                 print("  3. JavaScript content isn't loading properly")
                 print("\nTip: Check the browser window to see what the pages look like")
-            
+        
         except Exception as e:
             print(f"Error during scraping: {e}")
             print("\nTroubleshooting tips:")
@@ -177,263 +183,405 @@ class SoraScraperEnhanced:
             print("3. Verify you're not being blocked by rate limiting")
             import traceback
             traceback.print_exc()
-            
+        
         finally:
             if self.driver:
                 self.driver.quit()
         
         return self.images
     
-    def _collect_image_links(self, max_links, scroll_wait):
-        """Collect links to individual image detail pages from the gallery"""
-        links = set()
-        last_height = self.driver.execute_script("return document.body.scrollHeight")
-        scroll_attempts = 0
-        max_scrolls = 15
-        
-        # Debug: Save initial page source
-        print("\nDebug: Checking page content...")
-        soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-        all_links = soup.find_all('a', href=True)
-        print(f"Debug: Found {len(all_links)} total <a> tags on the page")
-        
-        # Show first few hrefs as examples
-        if all_links:
-            print("Debug: Sample hrefs:")
-            for a in all_links[:10]:
-                print(f"  - {a['href']}")
-        
-        while scroll_attempts < max_scrolls and len(links) < max_links:
-            # Parse current page
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            
-            # Look for links matching the pattern /g/gen_*
-            # Adjust selector based on actual Sora HTML structure
-            for a_tag in soup.find_all('a', href=True):
-                href = a_tag['href']
-                # Match Sora's generation URL pattern
-                if '/g/gen_' in href or '/gen_' in href:
-                    # Make absolute URL
-                    if href.startswith('/'):
-                        full_url = 'https://sora.chatgpt.com' + href
-                    elif not href.startswith('http'):
-                        full_url = 'https://sora.chatgpt.com/' + href
-                    else:
-                        full_url = href
-                    
-                    links.add(full_url)
-                    if len(links) >= max_links:
-                        break
-            
-            print(f"  Found {len(links)} links so far...")
+    # The gallery has rendered once it shows a link to a generation
+    GALLERY_LOADED = EC.presence_of_element_located((By.CSS_SELECTOR, 'a[href*="/gen_"]'))
+    
+    @staticmethod
+    def _document_ready(driver):
+        return driver.execute_script('return document.readyState') == 'complete'
+    
+    def _wait_for_page(self, condition=None, timeout=15):
+        """Wait until `condition` holds (default: the document has loaded); False on timeout"""
+        try:
+            WebDriverWait(self.driver, timeout).until(condition or self._document_ready)
+            return True
+        except TimeoutException:
+            print(f"  Page not ready after {timeout}s, continuing anyway")
+            return False
+    
+    def scrape_details(self, links, workers=3, rate=1.0, fetch_mode='browser'):
+        """
+        Scrape detail pages in parallel, returning results in link order.
+        
+        fetch_mode='browser' runs one Chrome per worker (the first reuses the
+        logged-in driver, the others get its cookies); fetch_mode='http' uses
+        plain HTTP requests with the same cookies, which is much lighter but
+        only works for pages that render their metadata server-side.
+        """
+        limiter = RateLimiter(rate)
+        total = len(links)
+        counter = {'done': 0}
+        counter_lock = threading.Lock()
+        spare_drivers = [self.driver] if self.driver and fetch_mode == 'browser' else []
+        cookies = self.driver.get_cookies() if self.driver else []
+        
+        def make_worker():
+            if fetch_mode == 'http':
+                return self._make_http_session(cookies)
+            with counter_lock:
+                if spare_drivers:
+                    return spare_drivers.pop()
+            return self._clone_driver(cookies)
+        
+        def close_worker(worker):
+            # The main driver is shut down by scrape_images()
+            if worker is self.driver:
+                return
+            if fetch_mode == 'browser':
+                worker.quit()
+            else:
+                worker.close()
+        
+        def process(worker, link):
+            if fetch_mode == 'http':
+                image_data = self._scrape_image_details(link, session=worker)
+            else:
+                image_data = self._scrape_image_details(link, driver=worker)
+            
+            with counter_lock:
+                counter['done'] += 1
+                done = counter['done']
+            if image_data and image_data.get('prompt'):
+                print(f"[{done}/{total}] ✓ Got: {image_data['prompt'][:60]}...")
+            elif image_data:
+                print(f"[{done}/{total}] ✓ Got image but no prompt: {link}")
+            return image_data
+        
+        return run_in_parallel(links, process, make_worker, close_worker,
+                               workers=workers, limiter=limiter)
+    
+    def _clone_driver(self, cookies):
+        """Start another browser carrying the logged-in session's cookies"""
+        driver = self.setup_driver()
+        driver.get('https://sora.chatgpt.com/')
+        for cookie in cookies:
+            cookie.pop('sameSite', None)
+            try:
+                driver.add_cookie(cookie)
+            except Exception:
+                pass  # Cookies for other domains can't be set from here
+        return driver
+    
+    def _make_http_session(self, cookies):
+        """requests Session carrying the logged-in browser's cookies"""
+        session = requests.Session()
+        session.headers['User-Agent'] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        for cookie in cookies:
+            session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'))
+        return session
+    
+    # Installed once per page: records every generation link as it is added to
+    # the DOM, so each call only returns hrefs not seen before instead of
+    # re-serializing and re-parsing the whole (growing) gallery
+    LINK_COLLECTOR_JS = """
+        if (!window.__linkCollector) {
+            const seen = new Set();
+            const pending = [];
+            const take = (a) => {
+                const href = a.href;
+                if (href && href.includes('/gen_') && !seen.has(href)) {
+                    seen.add(href);
+                    pending.push(href);
+                }
+            };
+            const scan = (node) => {
+                if (node.tagName === 'A') take(node);
+                if (node.querySelectorAll) node.querySelectorAll('a[href]').forEach(take);
+            };
+            scan(document.body);
+            new MutationObserver((mutations) => {
+                for (const m of mutations) {
+                    if (m.type === 'attributes') take(m.target);
+                    m.addedNodes.forEach((n) => { if (n.nodeType === 1) scan(n); });
+                }
+            }).observe(document.body, {
+                childList: true, subtree: true, attributes: true, attributeFilter: ['href']
+            });
+            window.__linkCollector = { drain: () => pending.splice(0, pending.length) };
+        }
+        return window.__linkCollector.drain();
+    """
+    
+    def _new_gallery_links(self):
+        """Generation links added to the page since the last call"""
+        return self.driver.execute_script(self.LINK_COLLECTOR_JS) or []
+    
+    def _collect_image_links(self, max_links, scroll_wait, max_idle_scrolls=3, max_scrolls=None):
+        """
+        Collect links to individual image detail pages from the gallery.
+        
+        After each scroll we wait up to `scroll_wait` seconds, returning as
+        soon as new links show up. Collection stops once `max_idle_scrolls`
+        scrolls in a row produce no new links (or max_links is reached).
+        """
+        links = dict.fromkeys(self._new_gallery_links())  # Ordered set
+        print(f"  Found {len(links)} links on initial load")
+        
+        idle_scrolls = 0
+        scrolls = 0
+        while len(links) < max_links and idle_scrolls < max_idle_scrolls:
+            if max_scrolls is not None and scrolls >= max_scrolls:
+                break
             
             # Scroll down
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(scroll_wait)
-            
-            # Check if we've reached the bottom
-            new_height = self.driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                print("  Reached end of gallery page")
-                break
-                
-            last_height = new_height
-            scroll_attempts += 1
+            scrolls += 1
+            
+            new_links = []
+            deadline = time.monotonic() + scroll_wait
+            while not new_links and time.monotonic() < deadline:
+                time.sleep(0.25)
+                new_links = self._new_gallery_links()
+            
+            before = len(links)
+            links.update(dict.fromkeys(new_links))
+            if len(links) > before:
+                idle_scrolls = 0
+                print(f"  Found {len(links)} links so far...")
+            else:
+                idle_scrolls += 1
+        
+        if len(links) < max_links:
+            print(f"  No new links after {idle_scrolls} scrolls, reached end of gallery")
         
-        return list(links)
+        return list(links)[:max_links]
     
-    def _scrape_image_details(self, url):
-        """Scrape detailed metadata from an individual image page"""
+    def _scrape_image_details(self, url, driver=None, session=None):
+        """Scrape detailed metadata from an individual image page (via a browser or HTTP session)"""
+        if session is None:
+            driver = driver or self.driver
         try:
-            self.driver.get(url)
-            time.sleep(3)  # Wait for page to load fully
-            
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            
-            # Extract image ID from URL
-            image_id = url.split('/')[-1]
-            
-            # Initialize data structure
-            image_data = {
-                'id': image_id,
-                'url': url,
-                'prompt': None,
-                'creator': None,
-                'creation_date': None,
-                'like_count': None,
-                'media_url': None,
-                'tags': [],
-                'source': 'sora'
-            }
-            
-            # Extract the actual image URL from <img alt="Generated image">
-            generated_img = soup.find('img', alt='Generated image')
-            if generated_img and generated_img.get('src'):
-                image_url = generated_img.get('src')
-                print(f"  Found image URL: {image_url[:80]}...")
-                
-                # Download the image
-                local_path = self.download_media(image_url, image_id)
-                if local_path:
-                    image_data['url'] = local_path
-                    image_data['local_file'] = local_path
-                    image_data['media_url'] = local_path
-                else:
-                    # Fallback to screenshot if download fails
-                    screenshot_path = os.path.join(self.images_dir, f"{image_id}.png")
-                    if not os.path.exists(screenshot_path):
-                        self.driver.save_screenshot(screenshot_path)
-                        print(f"  ✓ Screenshot fallback: {image_id}.png")
-                    image_data['url'] = screenshot_path
-                    image_data['local_file'] = screenshot_path
-                    image_data['media_url'] = screenshot_path
+            if session is not None:
+                response = session.get(url, timeout=30)
+                response.raise_for_status()
+                html = response.text
             else:
-                # No image found, take screenshot as fallback
-                print(f"  No image URL found, taking screenshot...")
-                screenshot_path = os.path.join(self.images_dir, f"{image_id}.png")
-                if not os.path.exists(screenshot_path):
-                    self.driver.save_screenshot(screenshot_path)
-                    print(f"  ✓ Screenshot saved: {image_id}.png")
-                image_data['url'] = screenshot_path
-                image_data['local_file'] = screenshot_path
-                image_data['media_url'] = screenshot_path
-            
-            # Extract prompt - based on actual Sora HTML structure
-            # The prompt is in: div.text-token-text-secondary (contains "Prompt") 
-            # followed by button.truncate (contains the actual prompt text)
-            
-            # Method 1: Look for the button next to "Prompt" text
-            prompt_label = soup.find('div', string='Prompt')
-            if prompt_label:
-                # Find the button sibling
-                prompt_button = prompt_label.find_next_sibling('button', class_='truncate')
-                if prompt_button:
-                    image_data['prompt'] = prompt_button.text.strip()
-            
-            # Method 2: If method 1 fails, try finding any button with truncate class near "Prompt"
-            if not image_data['prompt']:
-                prompt_container = soup.find('div', string=re.compile(r'Prompt', re.I))
-                if prompt_container:
-                    # Look for button in parent hierarchy
-                    parent = prompt_container.find_parent()
-                    if parent:
-                        prompt_button = parent.find('button', class_='truncate')
-                        if prompt_button:
-                            image_data['prompt'] = prompt_button.text.strip()
-            
-            # Method 3: Fallback to any button.truncate with substantial text
-            if not image_data['prompt']:
-                buttons = soup.find_all('button', class_='truncate')
-                for button in buttons:
-                    text = button.text.strip()
-                    if text and len(text) > 20:  # Prompts are usually longer
-                        image_data['prompt'] = text
-                        break
-            
-            # Extract creator and title - based on actual Sora HTML structure
-            # Structure: div > div (contains username link) + div (separator) + div (contains title)
-            
-            # Method 1: Find the username in an <a> tag with href containing "/explore?user="
-            user_link = soup.find('a', href=re.compile(r'/explore\?user='))
-            if user_link:
-                image_data['creator'] = user_link.text.strip()
-            
-            # Method 2: Fallback - look for link in text-token-text-secondary or text-token-text-primary
-            if not image_data['creator']:
-                creator_divs = soup.find_all('div', class_=re.compile(r'text-token-text-(secondary|primary)'))
-                for div in creator_divs:
-                    link = div.find('a')
-                    if link and link.get('href', '').startswith('/explore'):
-                        image_data['creator'] = link.text.strip()
-                        break
-            
-            # Extract title - it's in a div.truncate after the username section
-            # Look for div with class "truncate" that contains text (not a button)
-            title_candidates = soup.find_all('div', class_='truncate')
-            for candidate in title_candidates:
-                # Skip if it's a button (that's the prompt)
-                if candidate.find_parent('button'):
-                    continue
-                text = candidate.text.strip()
-                # Remove "Prompt" prefix if it exists (sometimes the title includes it)
-                if text.startswith('Prompt'):
-                    text = text[6:].strip()
-                # Title should be reasonable length and not be the username or prompt
-                if text and len(text) > 3 and text != image_data.get('creator') and text != image_data.get('prompt'):
-                    # Store as a tag or metadata (we'll add title field if needed)
-                    if 'title' not in image_data:
-                        image_data['title'] = text
-                    break
-            
-            # Extract like count - based on actual Sora HTML structure
-            # The like count is in a button with an SVG heart icon
-            # Structure: button > div > svg (heart icon) + div (contains the number)
-            
-            # Method 1: Find button with SVG heart path, then get adjacent div with number
-            heart_svg = soup.find('svg', {'viewBox': '0 0 24 24'})
-            if heart_svg:
-                heart_path = heart_svg.find('path', {'stroke': 'currentColor'})
-                if heart_path and 'M12 5.822c6.504' in heart_path.get('d', ''):
-                    # Found the heart icon, now find the number in the sibling div
-                    button = heart_svg.find_parent('button')
-                    if button:
-                        like_div = button.find('div', class_='flex px-2 text-center')
-                        if like_div:
-                            try:
-                                image_data['like_count'] = int(like_div.text.strip())
-                            except (ValueError, AttributeError):
-                                pass
-            
-            # Method 2: Fallback - look for button with heart SVG and extract any numbers
-            if not image_data['like_count']:
-                like_buttons = soup.find_all('button', class_=re.compile(r'surface-nav-element'))
-                for button in like_buttons:
-                    if button.find('svg'):
-                        # Check if there's a span or div with "Like" text
-                        like_text_elem = button.find('span', class_='sr-only', string=re.compile(r'Like', re.I))
-                        if like_text_elem:
-                            # Extract number from button text
-                            numbers = re.findall(r'\d+', button.text)
-                            if numbers:
-                                image_data['like_count'] = int(numbers[0])
-                                break
+                html = self._load_detail_page(driver, url)
+            self._mark(url, crawl_state.FETCHED)
             
-            # Extract date
-            date_elem = soup.find(['time', 'span', 'div'], class_=re.compile(r'(date|time|created)', re.I))
-            if date_elem:
-                image_data['creation_date'] = date_elem.get('datetime') or date_elem.text.strip()
-            
-            # Extract tags from prompt
-            if image_data['prompt']:
-                image_data['tags'] = self._extract_tags_from_text(image_data['prompt'])
+            image_data = self.parse_image_details(html, url)
+            self._mark(url, crawl_state.PARSED, record=image_data)
             
+            if not image_data.get('remote_media_url') and driver is not None:
+                # Nothing to download later; keep a screenshot while the page is open
+                self._save_screenshot(image_data, driver)
+                self._mark(url, crawl_state.DOWNLOADED, record=image_data)
             return image_data
-            
+        
         except Exception as e:
             print(f"  Error scraping {url}: {e}")
+            self._mark(url, crawl_state.FAILED, error=str(e))
             return None
     
-    def _extract_tags_from_text(self, text):
-        """Extract relevant tags from prompt text"""
-        tags = []
+    def _mark(self, url, status, record=None, error=None):
+        """Record crawl progress when running with a crawl-state store"""
+        if self.state is not None:
+            self.state.mark(url, status, record=record, error=error)
+    
+    def _load_detail_page(self, driver, url, timeout=15):
+        """Open a detail page and wait until its image or prompt has rendered"""
+        driver.get(url)
+        try:
+            WebDriverWait(driver, timeout).until(EC.any_of(
+                EC.presence_of_element_located((By.CSS_SELECTOR, 'img[alt="Generated image"]')),
+                EC.presence_of_element_located((By.CSS_SELECTOR, 'button.truncate')),
+            ))
+        except TimeoutException:
+            print(f"  Page did not finish rendering within {timeout}s, parsing what loaded")
+        return driver.page_source
+    
+    def _save_screenshot(self, image_data, driver):
+        """Stand-in for a page whose media URL couldn't be found"""
+        image_id = image_data['id']
+        print(f"  No image URL found, taking screenshot...")
+        local_path = os.path.join(self.images_dir, f"{image_id}.png")
+        if not os.path.exists(local_path):
+            driver.save_screenshot(local_path)
+            print(f"  ✓ Screenshot saved: {image_id}.png")
+        self._set_local_file(image_data, local_path)
+    
+    @staticmethod
+    def _set_local_file(image_data, local_path):
+        image_data['url'] = local_path
+        image_data['local_file'] = local_path
+        image_data['media_url'] = local_path
+    
+    def _download_scraped_media(self, scraped):
+        """
+        Download the media of scraped (link, record) pairs concurrently and
+        report throughput. Pages whose download fails are marked failed, so a
+        --resume run retries them (up to the crawl state's max_attempts).
+        """
+        items = [(record['remote_media_url'], record['id'])
+                 for _, record in scraped if record.get('remote_media_url')]
+        if not items:
+            return
+        
+        print(f"\nDownloading {len(items)} media files...")
+        paths = self.download_all_media(items)
+        for link, record in scraped:
+            remote_url = record.pop('remote_media_url', None)
+            if not remote_url:
+                continue
+            local_path = paths.get(record['id'])
+            if local_path:
+                self._set_local_file(record, local_path)
+                self._mark(link, crawl_state.DOWNLOADED, record=record)
+            else:
+                print(f"  ✗ Media download failed: {remote_url[:80]}")
+                self._mark(link, crawl_state.FAILED, record=record, error='media download failed')
+    
+    def parse_image_details(self, html, url):
+        """
+        Extract metadata from a detail page's HTML.
+        Works on saved pages too, so it needs no browser; the remote media URL
+        is returned under 'remote_media_url' for _download_scraped_media() to fetch.
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Extract image ID from URL
+        image_id = url.split('/')[-1]
+        
+        # Initialize data structure
+        image_data = {
+            'id': image_id,
+            'url': url,
+            'prompt': None,
+            'creator': None,
+            'creation_date': None,
+            'like_count': None,
+            'media_url': None,
+            'tags': [],
+            'source': 'sora'
+        }
+        
+        # Extract the actual image URL from <img alt="Generated image">
+        generated_img = soup.find('img', alt='Generated image')
+        if generated_img and generated_img.get('src'):
+            image_data['remote_media_url'] = generated_img.get('src')
+        
+        # Extract prompt - based on actual Sora HTML structure
+        # The prompt is in: div.text-token-text-secondary (contains "Prompt") 
+        # followed by button.truncate (contains the actual prompt text)
+        
+        # Method 1: Look for the button next to "Prompt" text
+        prompt_label = soup.find('div', string='Prompt')
+        if prompt_label:
+            # Find the button sibling
+            prompt_button = prompt_label.find_next_sibling('button', class_='truncate')
+            if prompt_button:
+                image_data['prompt'] = prompt_button.text.strip()
+        
+        # Method 2: If method 1 fails, try finding any button with truncate class near "Prompt"
+        if not image_data['prompt']:
+            prompt_container = soup.find('div', string=re.compile(r'Prompt', re.I))
+            if prompt_container:
+                # Look for button in parent hierarchy
+                parent = prompt_container.find_parent()
+                if parent:
+                    prompt_button = parent.find('button', class_='truncate')
+                    if prompt_button:
+                        image_data['prompt'] = prompt_button.text.strip()
+        
+        # Method 3: Fallback to any button.truncate with substantial text
+        if not image_data['prompt']:
+            buttons = soup.find_all('button', class_='truncate')
+            for button in buttons:
+                text = button.text.strip()
+                if text and len(text) > 20:  # Prompts are usually longer
+                    image_data['prompt'] = text
+                    break
+        
+        # Extract creator and title - based on actual Sora HTML structure
+        # Structure: div > div (contains username link) + div (separator) + div (contains title)
+        
+        # Method 1: Find the username in an <a> tag with href containing "/explore?user="
+        user_link = soup.find('a', href=re.compile(r'/explore\?user='))
+        if user_link:
+            image_data['creator'] = user_link.text.strip()
+        
+        # Method 2: Fallback - look for link in text-token-text-secondary or text-token-text-primary
+        if not image_data['creator']:
+            creator_divs = soup.find_all('div', class_=re.compile(r'text-token-text-(secondary|primary)'))
+            for div in creator_divs:
+                link = div.find('a')
+                if link and link.get('href', '').startswith('/explore'):
+                    image_data['creator'] = link.text.strip()
+                    break
+        
+        # Extract title - it's in a div.truncate after the username section
+        # Look for div with class "truncate" that contains text (not a button)
+        title_candidates = soup.find_all('div', class_='truncate')
+        for candidate in title_candidates:
+            # Skip if it's a button (that's the prompt)
+            if candidate.find_parent('button'):
+                continue
+            text = candidate.text.strip()
+            # Remove "Prompt" prefix if it exists (sometimes the title includes it)
+            if text.startswith('Prompt'):
+                text = text[6:].strip()
+            # Title should be reasonable length and not be the username or prompt
+            if text and len(text) > 3 and text != image_data.get('creator') and text != image_data.get('prompt'):
+                # Store as a tag or metadata (we'll add title field if needed)
+                if 'title' not in image_data:
+                    image_data['title'] = text
+                break
+        
+        # Extract like count - based on actual Sora HTML structure
+        # The like count is in a button with an SVG heart icon
+        # Structure: button > div > svg (heart icon) + div (contains the number)
         
-        if not text:
-            return tags
+        # Method 1: Find button with SVG heart path, then get adjacent div with number
+        heart_svg = soup.find('svg', {'viewBox': '0 0 24 24'})
+        if heart_svg:
+            heart_path = heart_svg.find('path', {'stroke': 'currentColor'})
+            if heart_path and 'M12 5.822c6.504' in heart_path.get('d', ''):
+                # Found the heart icon, now find the number in the sibling div
+                button = heart_svg.find_parent('button')
+                if button:
+                    like_div = button.find('div', class_='flex px-2 text-center')
+                    if like_div:
+                        try:
+                            image_data['like_count'] = int(like_div.text.strip())
+                        except (ValueError, AttributeError):
+                            pass
         
-        # Keywords that might indicate people in images
-        people_keywords = [
-            'person', 'people', 'man', 'woman', 'child', 'boy', 'girl',
-            'human', 'portrait', 'face', 'family', 'group', 'crowd',
-            'individual', 'someone', 'figure', 'character', 'lady', 'gentleman',
-            'adult', 'teenager', 'elder', 'senior', 'youth', 'baby', 'infant'
-        ]
+        # Method 2: Fallback - look for button with heart SVG and extract any numbers
+        if not image_data['like_count']:
+            like_buttons = soup.find_all('button', class_=re.compile(r'surface-nav-element'))
+            for button in like_buttons:
+                if button.find('svg'):
+                    # Check if there's a span or div with "Like" text
+                    like_text_elem = button.find('span', class_='sr-only', string=re.compile(r'Like', re.I))
+                    if like_text_elem:
+                        # Extract number from button text
+                        numbers = re.findall(r'\d+', button.text)
+                        if numbers:
+                            image_data['like_count'] = int(numbers[0])
+                            break
         
-        text_lower = text.lower()
-        for keyword in people_keywords:
-            if re.search(r'\b' + keyword + r'\b', text_lower):
-                tags.append(keyword)
+        # Extract date
+        date_elem = soup.find(['time', 'span', 'div'], class_=re.compile(r'(date|time|created)', re.I))
+        if date_elem:
+            image_data['creation_date'] = date_elem.get('datetime') or date_elem.text.strip()
         
-        return list(set(tags))  # Remove duplicates
+        # Extract tags from prompt
+        if image_data['prompt']:
+            image_data['tags'] = self._extract_tags_from_text(image_data['prompt'])
+        
+        return image_data
+    
+    def _extract_tags_from_text(self, text):
+        """Extract relevant tags from prompt text"""
+        # Whole-word matches against the shared people vocabulary (synonyms and plurals included)
+        return tag_people(text)
     
     def filter_images_with_people(self):
         """Filter images that likely contain people"""
@@ -459,8 +607,13 @@ class SoraScraperEnhanced:
             json.dump(self.images, f, indent=2, ensure_ascii=False)
         print(f"Saved {len(self.images)} images to {filename}")
     
-    def save_to_database(self, images=None):
-        """Save images directly to database (only new ones)"""
+    def save_to_database(self, images=None, on_duplicate='skip'):
+        """
+        Save images directly to database (only new ones).
+        Re-scraped or re-encoded copies of stored pictures are detected by
+        perceptual hash and skipped, or merged into the stored image with
+        on_duplicate='merge' ('keep' imports them anyway).
+        """
         if images is None:
             images = self.images
         
@@ -485,10 +638,9 @@ class SoraScraperEnhanced:
             return 0
         
         print(f"Found {len(new_images)} new images out of {len(images)} scraped")
-        count = db.add_images(new_images)
+        count = db.add_images(new_images, on_duplicate=on_duplicate)
         print(f"Added {count} new images to database")
         return count
-        return count
 
 
 def main():
@@ -503,15 +655,45 @@ def main():
     print("  - May require Sora account login")
     print("\n" + "="*60 + "\n")
     
+    parser = argparse.ArgumentParser(description='Scrape Sora images with detailed metadata')
+    parser.add_argument('--max-images', type=int, help='Number of images to scrape')
+    parser.add_argument('--workers', type=int, help='Parallel browser sessions')
+    parser.add_argument('--rate', type=float, default=1.0,
+                        help='Detail pages to load per second across all workers (default: 1)')
+    parser.add_argument('--fetch-mode', choices=['browser', 'http'], default='browser',
+                        help="Load detail pages in Chrome or, for server-rendered pages, with plain "
+                             "HTTP requests using the browser's cookies (default: browser)")
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the previous run, skipping pages it already finished')
+    parser.add_argument('--state-db', default='data/crawl_state.db',
+                        help='Crawl progress database (default: data/crawl_state.db)')
+    args = parser.parse_args()
+    
     # Get user preferences
-    max_images = input("How many images to scrape? (default: 50): ").strip()
-    max_images = int(max_images) if max_images.isdigit() else 50
+    max_images = args.max_images
+    if max_images is None:
+        max_images = input("How many images to scrape? (default: 50): ").strip()
+        max_images = int(max_images) if max_images.isdigit() else 50
+    
+    workers = args.workers
+    if workers is None:
+        workers = input("How many parallel browser sessions? (default: 3): ").strip()
+        workers = int(workers) if workers.isdigit() and int(workers) > 0 else 3
+    
+    # Progress is checkpointed per page so an interrupted run can --resume
+    state = crawl_state.CrawlState(args.state_db)
+    if args.resume:
+        print(f"Resuming from {args.state_db}: {state.summary()}")
     
     # Initialize scraper
-    scraper = SoraScraperEnhanced()
+    scraper = SoraScraperEnhanced(state=state)
     
     # Scrape images
-    all_images = scraper.scrape_images(max_images=max_images)
+    try:
+        all_images = scraper.scrape_images(max_images=max_images, workers=workers, rate=args.rate,
+                                           fetch_mode=args.fetch_mode, resume=args.resume)
+    finally:
+        state.close()
     
     if not all_images:
         print("\n⚠️  No images found. This could be because:")
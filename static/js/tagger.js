@@ -19,41 +19,120 @@ const submitBtn = document.getElementById('submit-btn');
 const noBiasBtn = document.getElementById('no-bias-btn');
 const progressText = document.getElementById('progress-text');
 
+// Images reserved by the server and preloaded, waiting to be shown
+const PREFETCH_SIZE = 5;
+const PREFETCH_LOW_WATER = 2;
+let imageQueue = [];
+let prefetchPromise = null;
+let hasMoreImages = true;
+
+// Fetch a batch of images and start downloading them in the background
+function prefetchImages() {
+    if (prefetchPromise) return prefetchPromise;
+    if (!hasMoreImages) return Promise.resolve();
+    
+    // Images we already hold aren't viewed yet, so ask the server to leave them out
+    const held = imageQueue.map(image => image.id);
+    if (currentImage) held.push(currentImage.id);
+    const exclude = encodeURIComponent(held.join(','));
+    
+    prefetchPromise = apiCall(`/api/next-images?n=${PREFETCH_SIZE}&exclude=${exclude}`)
+        .then(data => {
+            hasMoreImages = data.has_more;
+            data.images.forEach(image => {
+                preloadImage(image);
+                imageQueue.push(image);
+            });
+        })
+        .finally(() => {
+            prefetchPromise = null;
+        });
+    return prefetchPromise;
+}
+
+// Warm the browser cache with the same candidate the <img> will pick
+function preloadImage(image) {
+    const preload = new Image();
+    const sources = imageSources(image);
+    if (sources.srcset) {
+        preload.sizes = sources.sizes;
+        preload.srcset = sources.srcset;
+    }
+    preload.src = sources.src;
+}
+
 // Load next image
 async function loadNextImage() {
     try {
-        // Show loading
-        loadingEl.style.display = 'block';
-        imageContainerEl.style.display = 'none';
-        noImagesEl.style.display = 'none';
-        
         // Clear previous selections
         document.querySelectorAll('input[name="bias"]').forEach(cb => cb.checked = false);
         notesEl.value = '';
         
-        // Fetch next image
-        const data = await apiCall('/api/next-image');
+        if (imageQueue.length === 0) {
+            // Only the first image (or an empty queue) has to wait for the server
+            loadingEl.style.display = 'block';
+            imageContainerEl.style.display = 'none';
+            noImagesEl.style.display = 'none';
+            await prefetchImages();
+        }
         
-        if (data.has_more && data.image) {
-            currentImage = data.image;
-            displayImage(data.image);
-        } else {
+        const image = imageQueue.shift();
+        if (!image) {
+            currentImage = null;
             showNoImages();
+            return;
         }
-    } catch (error) {
-        if (error.message.includes('No more images')) {
-            showNoImages();
-        } else {
-            showNotification('Error loading image: ' + error.message, 'error');
+        
+        currentImage = image;
+        displayImage(image);
+        
+        if (imageQueue.length <= PREFETCH_LOW_WATER) {
+            prefetchImages().catch(() => {});
         }
+    } catch (error) {
+        showNotification('Error loading image: ' + error.message, 'error');
     }
 }
 
-// Display image
-function displayImage(image) {
+// Widths the server pre-generates for images served from /images/
+const VARIANT_WIDTHS = [320, 480, 768, 1024];
+
+// Normalize stored paths like "images\\gen_x.jpg" to "/images/gen_x.jpg"
+function localImagePath(url) {
+    const path = url.replace(/\\/g, '/');
+    if (path.startsWith('/images/')) return path;
+    if (path.startsWith('images/')) return '/' + path;
+    return null;
+}
+
+// src/srcset/sizes for an image; local images get resized variants
+function imageSources(image) {
     // Use media_url if available, fallback to url
     const imageUrl = image.media_url || image.url || '';
-    currentImageEl.src = imageUrl;
+    const localPath = localImagePath(imageUrl);
+    
+    if (!localPath) {
+        return { src: imageUrl };
+    }
+    // Let the browser pick a resized variant instead of the original
+    return {
+        src: `${localPath}?w=768`,
+        srcset: VARIANT_WIDTHS.map(w => `${localPath}?w=${w} ${w}w`).join(', '),
+        sizes: '(max-width: 768px) 100vw, 50vw'
+    };
+}
+
+// Display image
+function displayImage(image) {
+    const sources = imageSources(image);
+    
+    if (sources.srcset) {
+        currentImageEl.srcset = sources.srcset;
+        currentImageEl.sizes = sources.sizes;
+    } else {
+        currentImageEl.removeAttribute('srcset');
+    }
+    currentImageEl.src = sources.src;
     currentImageEl.alt = image.prompt || 'AI Generated Image';
     
     // Generate fictional data
@@ -107,7 +186,8 @@ async function submitTags() {
             body: JSON.stringify({
                 image_id: currentImage.id,
                 bias_tags: biasTags,
-                notes: notes
+                notes: notes,
+                prefetched: true
             })
         });
         
@@ -115,8 +195,8 @@ async function submitTags() {
         updateProgress();
         showNotification('Tags submitted successfully!', 'success');
         
-        // Load next image
-        setTimeout(() => loadNextImage(), 500);
+        // Next image is already preloaded, so show it straight away
+        loadNextImage();
         
     } catch (error) {
         showNotification('Error submitting tags: ' + error.message, 'error');
@@ -137,7 +217,8 @@ async function skipImage() {
         await apiCall('/api/skip-image', {
             method: 'POST',
             body: JSON.stringify({
-                image_id: currentImage.id
+                image_id: currentImage.id,
+                prefetched: true
             })
         });
         
@@ -160,6 +241,14 @@ function updateProgress() {
     progressText.innerHTML = `Images tagged this session: <strong>${imagesTagged}</strong>`;
 }
 
+// Views are recorded on submit/skip; report an image that was shown but left untouched
+window.addEventListener('pagehide', () => {
+    if (currentImage) {
+        const body = new Blob([JSON.stringify({ image_id: currentImage.id })], { type: 'application/json' });
+        navigator.sendBeacon('/api/view-image', body);
+    }
+});
+
 // Event listeners
 submitBtn.addEventListener('click', submitTags);
 noBiasBtn.addEventListener('click', skipImage);
@@ -0,0 +1,57 @@
+import pytest
+
+import crawl_state
+from crawl_state import CrawlState
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = CrawlState(str(tmp_path / 'crawl_state.db'))
+    yield state
+    state.close()
+
+
+def test_pending_urls_in_discovery_order(state):
+    assert state.enqueue(['https://a', 'https://b']) == 2
+    # Known URLs keep their place and state
+    assert state.enqueue(['https://b', 'https://c']) == 1
+    assert state.pending_urls() == ['https://a', 'https://b', 'https://c']
+    assert state.pending_urls(limit=2) == ['https://a', 'https://b']
+
+
+def test_downloaded_urls_are_done(state):
+    state.enqueue(['https://a', 'https://b'])
+    record = {'id': 'gen_1', 'prompt': 'a man'}
+    state.mark('https://a', crawl_state.FETCHED)
+    state.mark('https://a', crawl_state.PARSED, record=record)
+    state.mark('https://a', crawl_state.DOWNLOADED)
+    
+    assert state.pending_urls() == ['https://b']
+    # The record from an earlier step is kept
+    assert state.completed_records() == [record]
+    assert state.summary() == {'downloaded': 1, 'queued': 1}
+
+
+def test_failed_urls_stop_after_max_attempts(state):
+    state.enqueue(['https://a'])
+    for attempt in range(state.max_attempts):
+        assert state.pending_urls() == ['https://a']
+        state.mark('https://a', crawl_state.FETCHED)
+        state.mark('https://a', crawl_state.FAILED, error='timeout')
+    assert state.pending_urls() == []
+
+
+def test_progress_does_not_count_as_an_attempt(state):
+    state.enqueue(['https://a'])
+    for _ in range(state.max_attempts + 1):
+        state.mark('https://a', crawl_state.FETCHED)
+        state.mark('https://a', crawl_state.PARSED)
+    assert state.pending_urls() == ['https://a']
+
+
+def test_reset_forgets_everything(state):
+    state.enqueue(['https://a'])
+    state.mark('https://a', crawl_state.DOWNLOADED, record={'id': 'gen_1'})
+    state.reset()
+    assert state.pending_urls() == []
+    assert state.completed_records() == []
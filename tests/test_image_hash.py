@@ -0,0 +1,65 @@
+import random
+
+from PIL import Image, ImageDraw
+
+from image_hash import HammingIndex, dhash, from_hex, to_hex
+
+
+def flip(value, *bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_finds_hashes_within_max_distance():
+    index = HammingIndex(max_distance=4)
+    base = 0x0123456789ABCDEF
+    index.add(base, 'original')
+    index.add(flip(base, 0, 17, 40), 'three bits off')
+    index.add(flip(base, 1, 2, 3, 4, 5), 'five bits off')
+    
+    assert index.search(base) == [(0, 'original'), (3, 'three bits off')]
+    assert index.search(base, max_distance=2) == [(0, 'original')]
+    assert index.nearest(flip(base, 63)) == (1, 'original')
+    assert len(index) == 3
+
+
+def test_bits_spread_over_every_chunk():
+    # Each differing bit lands in a different chunk, so no chunk matches exactly
+    index = HammingIndex(max_distance=4)
+    index.add(0, 'zero')
+    assert index.search(flip(0, 0, 13, 26, 39, 52)) == []
+    # One chunk still matches when only four chunks differ
+    assert index.search(flip(0, 0, 13, 26, 39)) == [(4, 'zero')]
+
+
+def test_agrees_with_a_linear_scan():
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    # Plant some near neighbours
+    values += [flip(values[n], *rng.sample(range(64), rng.randint(1, 6))) for n in range(100)]
+    index = HammingIndex(max_distance=4)
+    for n, value in enumerate(values):
+        index.add(value, n)
+    
+    for query in values[:150]:
+        expected = sorted(((query ^ value).bit_count(), n) for n, value in enumerate(values)
+                          if (query ^ value).bit_count() <= 4)
+        assert sorted(index.search(query)) == expected
+
+
+def test_nearest_returns_none_without_a_match():
+    assert HammingIndex().nearest(0) is None
+
+
+def test_resized_copy_hashes_close(tmp_path):
+    image = Image.new('RGB', (400, 300), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((50, 40, 250, 260), fill='navy')
+    draw.rectangle((260, 100, 380, 280), fill='orange')
+    image.save(tmp_path / 'original.png')
+    image.resize((200, 150)).save(tmp_path / 'small.jpg', quality=70)
+    
+    original = dhash(tmp_path / 'original.png')
+    assert (original ^ dhash(tmp_path / 'small.jpg')).bit_count() <= 4
+    assert from_hex(to_hex(original)) == original
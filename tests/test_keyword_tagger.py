@@ -0,0 +1,49 @@
+from keyword_tagger import KeywordTagger, pluralize, tag_people
+
+
+def test_matches_whole_words_only():
+    tagger = KeywordTagger()
+    assert tagger.tag('A woman talking to her manager') == ['woman']
+    assert tagger.tag('A mannequin in a shop window') == []
+
+
+def test_synonyms_and_plurals_map_to_the_canonical_tag():
+    tagger = KeywordTagger()
+    assert tagger.tag('Two GUYS and some kids') == ['man', 'child']
+    assert tagger.tag('Children playing with men') == ['man', 'child']
+    # "people" is a tag of its own, not the plural of "person"
+    assert tagger.tag('people and one person') == ['person', 'people']
+
+
+def test_tags_come_in_vocabulary_order():
+    assert tag_people('a baby, a girl and a crowd') == ['girl', 'crowd', 'baby']
+
+
+def test_empty_text():
+    assert KeywordTagger().tag('') == []
+    assert KeywordTagger().tag(None) == []
+
+
+def test_multi_word_terms():
+    tagger = KeywordTagger({'police officer': ['cop']})
+    assert tagger.tag('Two police\nofficers and a cop') == ['police officer']
+    assert tagger.tag('police work') == []
+
+
+def test_add_extends_the_vocabulary():
+    tagger = KeywordTagger({'dog': []})
+    assert tagger.tag('a puppy') == []
+    tagger.add('dog', 'puppy')
+    assert tagger.tag('two puppies') == ['dog']
+
+
+def test_plurals_can_be_turned_off():
+    assert KeywordTagger({'cat': []}, plurals=False).tag('cats') == []
+
+
+def test_pluralize():
+    assert [pluralize(w) for w in ('lady', 'boy', 'church', 'woman')] == ['ladies', 'boys', 'churches', 'women']
+
+
+def test_tag_many():
+    assert KeywordTagger().tag_many(['a man', '', 'a teen']) == [['man'], [], ['teenager']]
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+import migrations
+from database import Database
+
+
+def table_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """A database with the base tables and 12 images, but no migrations applied"""
+    db = Database(str(tmp_path / 'legacy.db'), initialize=False)
+    db.init_database(migrate=False)
+    conn = db.get_connection()
+    conn.executemany(
+        'INSERT INTO images (id, url, prompt, tags, source) VALUES (?, ?, ?, ?, ?)',
+        [(f'gen_{n}', f'/images/gen_{n}.jpg', 'a woman', json.dumps(['woman']), 'sora') for n in range(12)]
+    )
+    conn.commit()
+    conn.close()
+    yield db
+    db.close()
+
+
+def test_status_is_read_only(legacy_db):
+    conn = legacy_db.get_connection()
+    try:
+        before = table_names(conn)
+        assert migrations.current_version(conn) == 0
+        assert [state for _, _, state in migrations.status(conn)] == ['pending'] * len(migrations.MIGRATIONS)
+        assert migrations.pending(conn) == migrations.MIGRATIONS
+        assert table_names(conn) == before
+    finally:
+        conn.close()
+
+
+def test_migrate_applies_everything_in_batches(legacy_db):
+    conn = legacy_db.get_connection()
+    batches = []
+    try:
+        applied = migrations.migrate(conn, batch_size=5, pause=0,
+                                     progress=lambda m, n: batches.append((m.version, n)))
+        assert [version for version, _ in applied] == [m.version for m in migrations.MIGRATIONS]
+        assert migrations.current_version(conn) == migrations.MIGRATIONS[-1].version
+        assert migrations.pending(conn) == []
+        assert {state for _, _, state in migrations.status(conn)} == {'applied'}
+        
+        # 12 rows in batches of 5: three chunks with data, then the one that finds none
+        assert batches == [(3, 1), (3, 2), (3, 3)]
+        assert conn.execute('SELECT COUNT(*) FROM images WHERE payload IS NULL').fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM image_tags WHERE tag = 'woman'").fetchone()[0] == 12
+        
+        # Running again is a no-op
+        assert migrations.migrate(conn, pause=0) == []
+    finally:
+        conn.close()
+
+
+def test_migrate_stops_at_target(legacy_db):
+    conn = legacy_db.get_connection()
+    try:
+        assert [version for version, _ in migrations.migrate(conn, target=2, pause=0)] == [1, 2]
+        assert [m.version for m in migrations.pending(conn)] == [3, 4]
+    finally:
+        conn.close()
+
+
+def test_dry_run_leaves_the_database_alone(legacy_db):
+    conn = legacy_db.get_connection()
+    before = table_names(conn)
+    conn.close()
+    
+    results = migrations.dry_run(legacy_db.db_path, sample_batches=1, batch_size=5, pause=0)
+    
+    assert [r['version'] for r in results] == [m.version for m in migrations.MIGRATIONS]
+    backfill = next(r for r in results if r['version'] == 3)
+    # One sampled batch of 5, extrapolated to the 12 rows
+    assert backfill['batches'] == 3
+    assert all(r['estimated_seconds'] >= 0 for r in results)
+    
+    conn = legacy_db.get_connection()
+    try:
+        assert table_names(conn) == before
+        assert migrations.current_version(conn) == 0
+    finally:
+        conn.close()
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+from PIL import Image
+
+import thumbnails
+from app import create_app
+from database import Database
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'images' / 'gen_1.jpg'
+    path.parent.mkdir()
+    Image.new('RGB', (1000, 600), 'teal').save(path)
+    return str(path)
+
+
+def test_get_variant_snaps_to_the_next_width(source, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    path, mimetype = thumbnails.get_variant(source, 300, 'webp', cache_dir)
+    
+    assert mimetype == 'image/webp'
+    assert path == thumbnails.variant_path(source, 320, 'webp', cache_dir)
+    with Image.open(path) as img:
+        assert img.format == 'WEBP'
+        assert img.size == (320, 192)
+
+
+def test_get_variant_reuses_the_cached_file(source, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    path, _ = thumbnails.get_variant(source, 480, 'jpeg', cache_dir)
+    mtime = os.stat(path).st_mtime_ns
+    assert thumbnails.get_variant(source, 400, 'jpeg', cache_dir) == (path, 'image/jpeg')
+    assert os.stat(path).st_mtime_ns == mtime
+
+
+def test_get_variant_never_upscales(source, tmp_path):
+    # 1024 is the largest width, and it's wider than the 1000px original
+    assert thumbnails.get_variant(source, 1000, 'webp', str(tmp_path / 'cache')) == (source, None)
+    assert thumbnails.get_variant(source, 5000, 'webp', str(tmp_path / 'cache')) == (source, None)
+
+
+@pytest.fixture
+def client(source, tmp_path, monkeypatch):
+    monkeypatch.setenv('FLASK_SECRET_KEY', 'test')
+    monkeypatch.setattr(thumbnails, 'CACHE_DIR', str(tmp_path / 'cache'))
+    db = Database(str(tmp_path / 'app.db'))
+    app = create_app(database=db)
+    app.extensions['assets'].directories['tagger.serve_image'] = os.path.dirname(source)
+    yield app.test_client()
+    db.close()
+
+
+@pytest.mark.parametrize('accept, mimetype', [
+    ('image/avif,image/webp,*/*;q=0.8', 'image/webp'),
+    ('image/webp', 'image/webp'),
+    # Wildcards match image/webp too, but don't mean the browser can decode it
+    ('image/*', 'image/jpeg'),
+    ('*/*', 'image/jpeg'),
+    ('image/webp;q=0,image/*', 'image/jpeg'),
+    (None, 'image/jpeg'),
+])
+def test_serve_image_negotiates_webp(client, source, accept, mimetype):
+    headers = {'Accept': accept} if accept else {}
+    response = client.get('/images/gen_1.jpg?w=320', headers=headers)
+    
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+    assert 'Accept' in response.vary
+    fmt = 'webp' if mimetype == 'image/webp' else 'jpeg'
+    with open(thumbnails.variant_path(source, 320, fmt), 'rb') as f:
+        assert response.data == f.read()
+
+
+def test_serve_image_without_width_sends_the_original(client, source):
+    response = client.get('/images/gen_1.jpg', headers={'Accept': 'image/webp'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    with open(source, 'rb') as f:
+        assert response.data == f.read()
+
+
+def test_serve_image_missing_file(client):
+    assert client.get('/images/missing.jpg?w=320').status_code == 404
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from database import Database
+from view_writer import ViewWriter
+
+
+class FakeDatabase:
+    """Collects the batches a ViewWriter writes; `gate` can hold the writer up"""
+    def __init__(self):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+    
+    def record_view_counts(self, views):
+        self.gate.wait(5)
+        self.batches.append(list(views))
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_writes_directly_when_not_started():
+    db = FakeDatabase()
+    writer = ViewWriter(db)
+    writer.record('gen_1', 'session', True)
+    assert db.batches == [[('gen_1', 'session', True)]]
+
+
+def test_flushes_a_full_batch():
+    db = FakeDatabase()
+    writer = ViewWriter(db, flush_interval=60, flush_size=3)
+    writer.start()
+    try:
+        for n in range(3):
+            writer.record(f'gen_{n}', 'session', True)
+        wait_for(lambda: db.batches)
+        assert db.batches == [[(f'gen_{n}', 'session', True) for n in range(3)]]
+    finally:
+        writer.stop()
+
+
+def test_flushes_after_the_interval():
+    db = FakeDatabase()
+    writer = ViewWriter(db, flush_interval=0.05, flush_size=100)
+    writer.start()
+    try:
+        writer.record('gen_1', 'session', False)
+        wait_for(lambda: db.batches)
+        assert db.batches == [[('gen_1', 'session', False)]]
+    finally:
+        writer.stop()
+
+
+def test_stop_writes_whatever_is_queued():
+    db = FakeDatabase()
+    writer = ViewWriter(db, flush_interval=60, flush_size=2)
+    writer.start()
+    for n in range(5):
+        writer.record(f'gen_{n}', 'session', True)
+    writer.stop()
+    
+    assert not writer.running
+    assert sum(db.batches, []) == [(f'gen_{n}', 'session', True) for n in range(5)]
+    stats = writer.get_stats()
+    assert stats['queued'] == stats['written'] == 5
+    assert stats['queue_size'] == 0
+
+
+def test_writes_directly_when_the_queue_is_full():
+    db = FakeDatabase()
+    writer = ViewWriter(db, flush_interval=0, flush_size=1, max_pending=1, put_timeout=0)
+    writer.start()
+    try:
+        # Hold the writer on its first batch so the next view fills the queue
+        db.gate.clear()
+        writer.record('gen_1', 'session', True)
+        wait_for(lambda: writer.get_stats()['queue_size'] == 0)
+        writer.record('gen_2', 'session', True)
+        db.gate.set()
+        writer.record('gen_3', 'session', True)
+        assert writer.get_stats()['direct_writes'] == 1
+    finally:
+        writer.stop()
+    assert sorted(view[0] for view in sum(db.batches, [])) == ['gen_1', 'gen_2', 'gen_3']
+
+
+@pytest.mark.parametrize('option', ['flush_size', 'max_pending'])
+def test_rejects_sizes_below_one(option):
+    with pytest.raises(ValueError):
+        ViewWriter(FakeDatabase(), **{option: 0})
+
+
+def test_counters_match_after_flush(tmp_path):
+    db = Database(str(tmp_path / 'views.db'))
+    try:
+        db.add_images([{'id': 'gen_1', 'url': '/images/gen_1.jpg', 'prompt': 'a man', 'tags': ['man']}])
+        db.start_view_writer()
+        db.record_view('gen_1', 'a')
+        db.record_view('gen_1', 'a')
+        db.record_view('gen_1', 'b')
+        
+        # The image_views rows are written straight away
+        conn = db.get_connection()
+        try:
+            assert conn.execute("SELECT COUNT(*) FROM image_views WHERE image_id = 'gen_1'").fetchone()[0] == 2
+        finally:
+            conn.close()
+        assert db.get_random_unviewed_image('a') is None
+        
+        db.stop_view_writer()
+        conn = db.get_connection()
+        try:
+            row = conn.execute("SELECT view_count, unique_viewers FROM images WHERE id = 'gen_1'").fetchone()
+        finally:
+            conn.close()
+        assert tuple(row) == (3, 2)
+    finally:
+        db.close()
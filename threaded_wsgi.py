@@ -0,0 +1,112 @@
+"""
+Run a WSGI app under an ASGI server on a thread pool
+
+asgiref's WsgiToAsgi calls the WSGI app through sync_to_async with
+thread_sensitive=True, which puts every request on one shared thread per
+process: pages, static files and on-demand image resizes all queue behind
+each other. ThreadPoolWsgi hands each request to a bounded
+ThreadPoolExecutor (WSGI_THREADS, default 8) instead, so they run
+concurrently like gunicorn's gthread workers, and streams the response back
+to the event loop chunk by chunk.
+"""
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ for an ASGI http scope and its request body (bytes)"""
+    script_name = scope.get('root_path', '').encode('utf-8').decode('latin-1')
+    path_info = scope['path'].encode('utf-8').decode('latin-1')
+    if script_name and path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    
+    for name, value in scope.get('headers') or []:
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = 'HTTP_' + key
+        value = value.decode('latin-1')
+        if key in environ:
+            # Repeated headers are joined; cookies use their own separator
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+class ThreadPoolWsgi:
+    """ASGI app that runs `wsgi_application` on up to `workers` threads"""
+    def __init__(self, wsgi_application, workers=None):
+        self.wsgi_application = wsgi_application
+        self.workers = workers or int(os.environ.get('WSGI_THREADS', 8))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='wsgi')
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError("WSGI apps only handle http requests")
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._run, wsgi_environ(scope, body), send, loop)
+    
+    def _run(self, environ, send, loop):
+        """Call the app on a pool thread, passing each message back to the event loop"""
+        def push(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+        
+        response = {}
+        
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['start'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                            for name, value in headers],
+            }
+        
+        def start():
+            if not response.get('started'):
+                response['started'] = True
+                push(response['start'])
+        
+        result = self.wsgi_application(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    start()
+                    push({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            start()
+            push({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+    
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,185 @@
+"""
+Responsive image variants for the images/ directory
+
+The tagging UI shows images at a few hundred pixels wide, so sending the
+original 1-4 MB files is wasted bandwidth. This module pre-generates resized
+WebP and JPEG variants at a handful of widths and stores them in a cache
+directory keyed by the source file's content hash, so a re-encoded or
+replaced image never serves a stale variant.
+
+Usage:
+    python thumbnails.py                 # generate variants for images/
+    python thumbnails.py --workers 8     # with a bigger process pool
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image, ImageOps
+
+from asset_cache import file_hash as content_hash
+
+IMAGES_DIR = 'images'
+CACHE_DIR = os.environ.get('THUMBNAIL_CACHE_DIR', os.path.join('data', 'thumbnails'))
+
+# Widths offered to the browser via srcset; requests snap to the next one up
+WIDTHS = (320, 480, 768, 1024)
+
+FORMATS = {
+    'webp': {'ext': 'webp', 'mimetype': 'image/webp', 'save': {'format': 'WEBP', 'quality': 80, 'method': 4}},
+    'jpeg': {'ext': 'jpg', 'mimetype': 'image/jpeg', 'save': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}},
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+_width_cache = {}
+_width_lock = threading.Lock()
+_generate_lock = threading.Lock()
+
+
+def _source_info(path):
+    """(content hash, pixel width) of a source file"""
+    digest = content_hash(path)
+    
+    with _width_lock:
+        width = _width_cache.get(digest)
+    if width is None:
+        with Image.open(path) as img:
+            width = img.width
+        with _width_lock:
+            _width_cache[digest] = width
+    return digest, width
+
+
+def pick_width(requested):
+    """Snap a requested width to the smallest configured width that covers it"""
+    for width in WIDTHS:
+        if width >= requested:
+            return width
+    return WIDTHS[-1]
+
+
+def variant_path(source, width, fmt, cache_dir=None):
+    """Cache location of one variant of a source image"""
+    cache_dir = cache_dir or CACHE_DIR
+    filename = f"{content_hash(source)}_{width}.{FORMATS[fmt]['ext']}"
+    return os.path.join(cache_dir, filename)
+
+
+def _render(img, width, fmt, dest):
+    """Resize an already-open image and write it atomically to dest"""
+    variant = img.copy()
+    # thumbnail() keeps the aspect ratio and never upscales
+    variant.thumbnail((width, width * 4), Image.LANCZOS)
+    
+    tmp_path = f"{dest}.{os.getpid()}.tmp"
+    variant.save(tmp_path, **FORMATS[fmt]['save'])
+    os.replace(tmp_path, dest)
+
+
+def _open_for_resize(source):
+    """Open a source image upright and in a mode every output format accepts"""
+    img = Image.open(source)
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    return img
+
+
+def generate_variants(source, widths=WIDTHS, formats=tuple(FORMATS), cache_dir=None):
+    """Generate every missing variant of one source image; returns how many were written"""
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    
+    # Widths at or above the original would just re-encode it, usually larger
+    source_width = _source_info(source)[1]
+    missing = [(width, fmt) for width in widths for fmt in formats
+               if width < source_width
+               and not os.path.exists(variant_path(source, width, fmt, cache_dir))]
+    if not missing:
+        return 0
+    
+    with _open_for_resize(source) as img:
+        for width, fmt in missing:
+            _render(img, width, fmt, variant_path(source, width, fmt, cache_dir))
+    return len(missing)
+
+
+def get_variant(source, requested_width, fmt='webp', cache_dir=None):
+    """
+    Path and mimetype of the variant closest to requested_width, generating
+    it on demand if the batch job has not produced it yet. Returns
+    (source, None) when the original is no wider than the requested width.
+    """
+    width = pick_width(requested_width)
+    if width >= _source_info(source)[1]:
+        return source, None
+    path = variant_path(source, width, fmt, cache_dir)
+    
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One on-demand resize at a time keeps a burst of cold requests
+        # from saturating every worker with Pillow work
+        with _generate_lock:
+            if not os.path.exists(path):
+                with _open_for_resize(source) as img:
+                    _render(img, width, fmt, path)
+    
+    return path, FORMATS[fmt]['mimetype']
+
+
+def _generate_worker(args):
+    """Process-pool entry point: (source, cache_dir) -> (source, written, error)"""
+    source, cache_dir = args
+    try:
+        return source, generate_variants(source, cache_dir=cache_dir), None
+    except Exception as e:
+        return source, 0, str(e)
+
+
+def generate_all(images_dir=IMAGES_DIR, cache_dir=None, workers=None):
+    """Generate variants for every image in images_dir using a process pool"""
+    cache_dir = cache_dir or CACHE_DIR
+    sources = [
+        os.path.join(images_dir, name)
+        for name in sorted(os.listdir(images_dir))
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    
+    totals = {'images': len(sources), 'variants': 0, 'failed': 0}
+    start = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_generate_worker, (source, cache_dir)) for source in sources]
+        for future in as_completed(futures):
+            source, written, error = future.result()
+            if error:
+                totals['failed'] += 1
+                print(f"  ✗ {source}: {error}")
+            totals['variants'] += written
+    
+    totals['seconds'] = time.perf_counter() - start
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate resized image variants")
+    parser.add_argument('--images-dir', default=IMAGES_DIR)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Process pool size (default: number of CPUs)")
+    args = parser.parse_args()
+    
+    print(f"Generating {', '.join(map(str, WIDTHS))}px variants for {args.images_dir}/...")
+    totals = generate_all(args.images_dir, args.cache_dir, args.workers)
+    
+    print(f"✓ Wrote {totals['variants']} variants for {totals['images']} images "
+          f"in {totals['seconds']:.1f}s")
+    if totals['failed']:
+        print(f"  {totals['failed']} images could not be processed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Write-behind queue for view counters
+
+Database.record_view() inserts the image_views row on the request, in a
+single autocommit statement: that row is what keeps an image from being
+served to the session again, and every worker process has to see it at once.
+Everything else a view changes (view_count and unique_viewers on the image,
+the session's last_active, and the 5-viewers lifecycle rule) is pushed onto
+an in-process queue, and a background thread applies it with
+Database.record_view_counts(), one transaction per batch. A batch is flushed
+once VIEW_FLUSH_SIZE views are waiting or VIEW_FLUSH_INTERVAL seconds after
+its first view, whichever comes first.
+
+The queue is bounded (VIEW_QUEUE_SIZE). When the writer falls behind, record()
+blocks for up to VIEW_QUEUE_TIMEOUT seconds and then applies the view itself,
+so a slow disk slows requests down rather than dropping counts. stop() (run at
+exit) drains whatever is still queued; counts lost to a hard crash are
+rebuilt by `maintenance.py reconcile`.
+"""
+import os
+import queue
+import threading
+import time
+
+
+class ViewWriter:
+    """Batches (image_id, session_id, new_viewer) views into Database.record_view_counts() calls"""
+    # Longest the writer blocks on the queue before checking for stop()
+    POLL_INTERVAL = 0.1
+    
+    def __init__(self, db, flush_interval=None, flush_size=None, max_pending=None, put_timeout=None):
+        self.db = db
+        if flush_interval is None:
+            flush_interval = float(os.environ.get('VIEW_FLUSH_INTERVAL', 0.5))
+        if flush_size is None:
+            flush_size = int(os.environ.get('VIEW_FLUSH_SIZE', 200))
+        if max_pending is None:
+            max_pending = int(os.environ.get('VIEW_QUEUE_SIZE', 10000))
+        # A zero flush size would never fill a batch, and Queue(maxsize=0) is unbounded
+        if flush_size < 1:
+            raise ValueError(f"VIEW_FLUSH_SIZE must be at least 1, got {flush_size}")
+        if max_pending < 1:
+            raise ValueError(f"VIEW_QUEUE_SIZE must be at least 1, got {max_pending}")
+        self.flush_interval = max(flush_interval, 0)
+        self.flush_size = flush_size
+        self.put_timeout = put_timeout if put_timeout is not None else float(os.environ.get('VIEW_QUEUE_TIMEOUT', 1))
+        
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        
+        self.stats = {'queued': 0, 'written': 0, 'batches': 0, 'direct_writes': 0, 'errors': 0}
+    
+    def start(self):
+        """Start the writer thread (once per process; forked workers start their own)"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='view-writer', daemon=True)
+        self._thread.start()
+    
+    @property
+    def running(self):
+        return self._thread is not None
+    
+    def record(self, image_id, session_id, new_viewer):
+        """Queue a view's counter updates; applies them directly if the queue stays full"""
+        view = (image_id, session_id, new_viewer)
+        if not self.running:
+            self.db.record_view_counts([view])
+            return
+        
+        try:
+            self._queue.put(view, timeout=self.put_timeout)
+            counter = 'queued'
+        except queue.Full:
+            self.db.record_view_counts([view])
+            counter = 'direct_writes'
+        with self._lock:
+            self.stats[counter] += 1
+    
+    def _next_batch(self):
+        """Wait for the first view, then collect more until the batch is full or its time is up"""
+        try:
+            batch = [self._queue.get(timeout=self.POLL_INTERVAL)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(remaining, self.POLL_INTERVAL)))
+            except queue.Empty:
+                continue
+        return batch
+    
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+    
+    def _write(self, batch):
+        try:
+            self.db.record_view_counts(batch)
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+        except Exception as e:
+            # record_view_counts() rolled back; keep going rather than kill the writer
+            self.stats['errors'] += 1
+            print(f"Error writing {len(batch)} views: {e}")
+    
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+        
+        # Shutting down: write everything still queued
+        remaining = self._drain()
+        for offset in range(0, len(remaining), self.flush_size):
+            self._write(remaining[offset:offset + self.flush_size])
+    
+    def stop(self, timeout=10):
+        """Flush queued views and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        
+        # Anything queued after the thread exited
+        remaining = self._drain()
+        if remaining:
+            self._write(remaining)
+    
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        return dict(stats, queue_size=self._queue.qsize())
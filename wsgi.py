@@ -0,0 +1,10 @@
+"""
+WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Run `python maintenance.py migrate --seed` once per deploy before starting.
+"""
+from app import create_app
+
+app = create_app()